@@ -1,18 +1,17 @@
 from doit import DAG, DictBackend, delayed, File
-from doit.artifact import InMemoryArtifact
+from doit.artifact import FileGlob, InMemoryArtifact
 from doit.backend import Backend
 from doit.reporter import TaskEvent
 from doit.task import Task
 
 from pathlib import Path
-import time
 
 from doit.task import AutoUpdate
 
 
-def process_file(file: File, target: InMemoryArtifact):
+def process_file(path: Path, target: InMemoryArtifact):
     target.put_data(
-        file.path.read_text(encoding='utf-8')
+        path.read_text(encoding='utf-8')
     )
 
 
@@ -25,6 +24,9 @@ def node2group(node):
         if 'many_files' in str(node.path):
             return "Input file nodes"
 
+    if isinstance(node, FileGlob):
+        return "Input file nodes"
+
     return None
 
 
@@ -33,13 +35,15 @@ def create_dag(backend: Backend) -> DAG:
 
     sink = AutoUpdate("sink", backend)
 
-    for f in Path(r"C:\Users\Dmitrii\Desktop\many_files").glob("*.md"):
-        dag.py_task(
-            f"Parse {f}",
-            delayed(process_file)(file=File(f).dep, target=InMemoryArtifact("artifact").tar),
-            reporter=dag.reporter.filter_events(keep_task_events=(TaskEvent.EXECUTE, )),
-            targets=[sink, ]
-        )
+    # only added and modified files are parsed, new files are noticed by dag.watch
+    dag.map_task(
+        "Parse files",
+        process_file,
+        FileGlob(r"C:\Users\Dmitrii\Desktop\many_files", "*.md"),
+        kwargs=dict(target=InMemoryArtifact("artifact").tar),
+        reporter=dag.reporter.filter_events(keep_task_events=(TaskEvent.EXECUTE, )),
+        targets=[sink, ]
+    )
 
     dag.py_task("Say hello", delayed(print)("Hello there!"), depends_on=[sink, ])
 
@@ -49,14 +53,11 @@ def create_dag(backend: Backend) -> DAG:
 def main():
     backend = DictBackend("Batch main", ".batch.json")
 
-    while True:
-        dag = create_dag(backend)
-        dag.render_online('https://dreampuf.github.io/GraphvizOnline/#', node2group=node2group)
-
-        dag.run(backend, )
+    dag = create_dag(backend)
+    dag.render_online('https://dreampuf.github.io/GraphvizOnline/#', node2group=node2group)
 
-        return
-        # time.sleep(10)
+    # runs the DAG, then re-runs the parser on added and modified files
+    dag.watch(backend)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 from .dag import DAG
-from .artifact import File
-from .backend import DictBackend
+from .artifact import File, FileGlob
+from .backend import DictBackend, SqliteBackend
+from .cache import ArtifactCache
 
-from .action import delayed
+from .action import delayed, batched
@@ -1,6 +1,11 @@
+import asyncio
+import functools
 import os
+import pathlib
+import re
 import subprocess
 import inspect
+import types
 from abc import ABC
 from copy import copy
 from itertools import chain
@@ -10,7 +15,48 @@ from typing import List, Any
 from loguru import logger
 
 
-from .artifact import ArtifactLabel, AsDependencyArtifact, AsTargetArtifact
+from . import hashing
+from .artifact import ArtifactLabel, AsDependencyArtifact, AsTargetArtifact, FileGlob
+
+_ADDRESS_RE = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+@functools.lru_cache(maxsize=None)
+def _code_identity(code: types.CodeType) -> str:
+    """
+    Hash of bytecode, constants and names of the code object.
+    Line numbers are not included: moving a function around does not change it.
+    """
+    consts = [_value_identity(_) for _ in code.co_consts]
+
+    return hashing.hash_bytes("\n".join([code.co_code.hex(), *consts, *code.co_names]).encode("utf-8"))
+
+
+def _value_identity(a) -> str:
+    """
+    Stable between processes: functions are described by their code, memory addresses are dropped from reprs,
+    members of sets and items of dicts are sorted (their order depends on hash randomization)
+    """
+    if isinstance(a, types.CodeType):
+        return _code_identity(a)
+    if isinstance(a, (set, frozenset)):
+        return f"{type(a).__name__}({{{', '.join(sorted(_value_identity(_) for _ in a))}}})"
+    if isinstance(a, dict):
+        items = sorted(f"{_value_identity(k)}: {_value_identity(v)}" for k, v in a.items())
+        return f"{type(a).__name__}({{{', '.join(items)}}})"
+    if isinstance(a, (list, tuple)):
+        return f"{type(a).__name__}([{', '.join(_value_identity(_) for _ in a)}])"
+
+    if isinstance(a, AsDependencyArtifact):
+        return f"<dep: {a.a.label()}>"
+    if isinstance(a, AsTargetArtifact):
+        return f"<tar: {a.a.label()}>"
+
+    code = getattr(a, "__code__", None)
+    if isinstance(code, types.CodeType):
+        return f"{getattr(a, '__module__', None)}.{getattr(a, '__qualname__', None)}: {_code_identity(code)}"
+
+    return _ADDRESS_RE.sub("", repr(a))
 
 
 class AbstractAction(ABC):
@@ -19,12 +65,24 @@ class AbstractAction(ABC):
     def execute(self):
         raise NotImplementedError()
 
+    async def execute_async(self):
+        """
+        Awaitable version of execute. Blocking actions are executed in a separate thread
+        """
+        await asyncio.to_thread(self.execute)
+
     def get_all_dependencies(self) -> List[ArtifactLabel]:
         raise NotImplementedError()
 
     def get_all_targets(self) -> List[ArtifactLabel]:
         raise NotImplementedError()
 
+    def identity(self) -> str:
+        """
+        String which is the same for actions doing the same thing, used in keys of cache.ArtifactCache
+        """
+        return repr(self)
+
 
 class CmdAction(AbstractAction):
     """
@@ -83,7 +141,7 @@ class CmdAction(AbstractAction):
             env=env,
             **subprocess_pkwargs)
 
-        logger.info(f"Executing {self.task.name}")
+        logger.info("Executing {}", self.task.name)
 
         # make sure process really terminated
         process.wait()
@@ -145,6 +203,9 @@ class CmdAction(AbstractAction):
             assert self.STRING_FORMAT == 'both'
             return self.action.format(**subs_dict) % subs_dict
 
+    def identity(self) -> str:
+        return repr(self.expand_action())
+
     def __str__(self):
         return "Cmd: %s" % self.action
 
@@ -177,11 +238,7 @@ class PythonAction(AbstractAction):
             msg = "%s kwargs must be a 'dict'. got '%s'"
             raise Exception(msg % (self.py_callable, self.kwargs))
 
-    def execute(self):
-        """
-        Execute command action
-        """
-
+    def _prepare_call(self):
         args = list(self.args)
         kwargs = self.kwargs.copy()
 
@@ -193,11 +250,47 @@ class PythonAction(AbstractAction):
             if isinstance(v, (AsDependencyArtifact, AsTargetArtifact)):
                 kwargs[k] = v.a.prepare_for_function_call()
 
-        self.py_callable(*args, **kwargs)
+        return args, kwargs
+
+    def is_coroutine(self) -> bool:
+        return inspect.iscoroutinefunction(self.py_callable)
+
+    def execute(self):
+        """
+        Execute command action
+        """
+        args, kwargs = self._prepare_call()
+
+        if self.is_coroutine():
+            asyncio.run(self.py_callable(*args, **kwargs))
+        else:
+            self.py_callable(*args, **kwargs)
+
+    async def execute_async(self):
+        """
+        Await `async def` callables in the running loop, other callables are executed in a separate thread
+        """
+        if not self.is_coroutine():
+            await super().execute_async()
+            return
+
+        args, kwargs = self._prepare_call()
+        await self.py_callable(*args, **kwargs)
 
     def __repr__(self):
         return "<PythonAction: '%s'>" % (repr(self.py_callable))
 
+    def identity(self) -> str:
+        """
+        Qualified name and code hash of the callable and reprs of its arguments.
+        Changes of objects without a meaningful repr are not noticed.
+        """
+        parts = [_value_identity(self.py_callable)]
+        parts += [_value_identity(_) for _ in self.args]
+        parts += [f"{k}={_value_identity(v)}" for k, v in sorted(self.kwargs.items())]
+
+        return "\n".join(parts)
+
     def _gen(self, as_artifact_type):
         for _ in chain(self.args, self.kwargs.values()):
             if isinstance(_, ArtifactLabel):
@@ -214,11 +307,128 @@ class PythonAction(AbstractAction):
         return list(self._gen(AsTargetArtifact))
 
 
+class MapAction(PythonAction):
+    """
+    Calls py_callable(path, *args, **kwargs) for every added or modified file of the FileGlob
+    and on_removed(path, *args, **kwargs) for every removed one, see DAG.map_task
+    """
+
+    def __init__(self, py_callable, inputs: FileGlob, on_removed=None, args=None, kwargs=None, name: str = ""):
+        """
+        :param name: name of the task, the index of processed files is kept under it (see FileGlob.index)
+        """
+        super().__init__(py_callable, args, kwargs)
+
+        self.inputs = inputs
+        self.on_removed = on_removed
+        self.name = name
+
+        self._index = None  # loaded by the main process, sent to workers with the action
+        self._listing = None  # processed by the last execution in this process
+
+    def load_index(self, backend) -> None:
+        """
+        Should be called by the main process with the backend of the run before the action is executed.
+        Without the index all the files are processed.
+        """
+        self._index = self.inputs.index(backend, self.name)
+
+    def save_index(self, backend) -> None:
+        """
+        Listing of the directory scanned before the execution is saved if it was executed in another process:
+        files changed meanwhile are processed again by the next execution
+        """
+        self.inputs.save_index(backend, self.name, self._listing)
+        self._index = self._listing = None
+
+    def inputs_fingerprint(self) -> str:
+        """
+        Fingerprint of the listing saved by `save_index`: files added during the execution are not part of it
+        """
+        return self.inputs.listing_fingerprint(self._listing)
+
+    def execute(self):
+        args, kwargs = self._prepare_call()
+
+        # directory is scanned again: files may have changed since the up-to-date check
+        index = {} if self._index is None else self._index
+        self._listing = self.inputs.scan()
+        changed, removed = FileGlob.changes(index, self._listing)
+
+        for path in changed:
+            self.py_callable(pathlib.Path(path), *args, **kwargs)
+
+        if self.on_removed is not None:
+            for path in removed:
+                self.on_removed(pathlib.Path(path), *args, **kwargs)
+
+    async def execute_async(self):
+        await asyncio.to_thread(self.execute)
+
+    def get_all_dependencies(self) -> List[ArtifactLabel]:
+        return [self.inputs] + super().get_all_dependencies()
+
+    def identity(self) -> str:
+        return "\n".join([super().identity(), self.inputs.label(), _value_identity(self.on_removed)])
+
+    def __repr__(self):
+        return f"<MapAction: {self.py_callable!r} over {self.inputs}>"
+
+
+class BatchAction(PythonAction):
+    """
+    Action of one of many similar small tasks. DAG executes ready tasks with the same callable together,
+    in chunks of up to batch_size: py_callable(batch) is called once per chunk,
+    batch is the list of tuples of arguments of the tasks (artifacts are prepared as in PythonAction).
+    """
+
+    def __init__(self, py_callable, args=None, batch_size=100):
+        super().__init__(py_callable, args)
+
+        self.batch_size = batch_size
+
+    def batch_key(self):
+        """
+        Actions with equal keys may be executed in one batch
+        """
+        return self.py_callable, self.batch_size
+
+    @staticmethod
+    def execute_batch(actions: List["BatchAction"]):
+        batch = [tuple(_._prepare_call()[0]) for _ in actions]
+        func = actions[0].py_callable
+
+        if inspect.iscoroutinefunction(func):
+            asyncio.run(func(batch))
+        else:
+            func(batch)
+
+    def execute(self):
+        self.execute_batch([self])
+
+    async def execute_async(self):
+        if not self.is_coroutine():
+            await asyncio.to_thread(self.execute)
+            return
+
+        await self.py_callable([tuple(self._prepare_call()[0])])
+
+    def __repr__(self):
+        return "<BatchAction: '%s'>" % (repr(self.py_callable))
+
+
 class _IncompletePythonAction:
-    def __init__(self, py_callable):
+    def __init__(self, py_callable, batch_size=None):
         self.py_callable = py_callable
+        self.batch_size = batch_size
 
     def __call__(self, *args, **kwargs):
+        if self.batch_size is not None:
+            if kwargs:
+                raise Exception(f"Batched {self.py_callable} accepts only positional arguments")
+
+            return BatchAction(self.py_callable, args, self.batch_size)
+
         return PythonAction(
             self.py_callable,
             args,
@@ -228,3 +438,10 @@ class _IncompletePythonAction:
 
 def delayed(py_callable):
     return _IncompletePythonAction(py_callable)
+
+
+def batched(py_callable, batch_size=100):
+    """
+    As delayed, but py_callable receives a list of argument tuples of several tasks, see BatchAction
+    """
+    return _IncompletePythonAction(py_callable, batch_size)
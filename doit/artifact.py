@@ -1,8 +1,17 @@
+import glob
+import json
+import os
 import pathlib
-import hashlib
-from typing import Any, Dict
+import shutil
+import stat
+import time
+from typing import Any, Dict, Callable, List, Set, Tuple, Union
 
+from . import hashing
 from .node import Node
+from .store import ArtifactStore, dump_value, load_value
+from .reporter import SpanEvent
+from .stats import worker_name
 
 
 class ArtifactLabel(Node):
@@ -31,6 +40,27 @@ class ArtifactLabel(Node):
         """
         return self
 
+    def store(self, path: pathlib.Path) -> None:
+        """
+        Save content of the artifact into the file, see cache.ArtifactCache
+        """
+        raise NotImplementedError()
+
+    def restore(self, path: pathlib.Path) -> None:
+        """
+        Load content of the artifact saved by `store`
+        """
+        raise NotImplementedError()
+
+    def store_format(self) -> str:
+        """
+        Name of the format of files written by `store`. Stored files are interchangeable
+        only if both their formats and fingerprints are the same.
+        By default it is the artifact type which defines `store`, so subclasses share the format of their base.
+        """
+        owner = next(_ for _ in type(self).__mro__ if "store" in _.__dict__)
+        return f"{owner.__module__}.{owner.__qualname__}"
+
     @property
     def tar(self):
         """
@@ -56,9 +86,117 @@ class AsTargetArtifact:
         self.a = a
 
 
+class FingerprintMemo:
+    """
+    Run-scoped cache of artifact fingerprints: artifact used by many tasks is hashed once per run.
+    Entry is dropped when a task producing the artifact is executed.
+    Time spent on hashing is sent to `reporter.span` (see reporter.ExecutionReporter).
+    """
+
+    def __init__(self, reporter=None):
+        self.label2fingerprint = {}  # type: Dict[str, str]
+        self.reporter = reporter
+
+    def fingerprint(self, a: ArtifactLabel) -> str:
+        label = a.label()
+
+        try:
+            return self.label2fingerprint[label]
+        except KeyError:
+            pass
+
+        if self.reporter is None:
+            fp = self.label2fingerprint[label] = a.fingerprint()
+            return fp
+
+        start = time.time()
+        fp = self.label2fingerprint[label] = a.fingerprint()
+        self.reporter.span(SpanEvent.FINGERPRINT, label, start, time.time() - start, worker_name())
+
+        return fp
+
+    def invalidate(self, artifacts) -> None:
+        for a in artifacts:
+            self.label2fingerprint.pop(a.label(), None)
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 
+class FileStatCache:
+    """
+    Fingerprints of files keyed by their stat info, so unchanged files are not re-hashed.
+    As legacy MD5Checker, it considers file unchanged if (size, mtime_ns, inode) is the same
+    and it was hashed with the current algorithm.
+    Stored in the backend between runs, one key per path: only entries of re-hashed files are written.
+    Bound to the backend of the running DAG (see `load`), entries are read from it lazily.
+    """
+    KEY_PREFIX = "<File>: stat cache: "
+
+    def __init__(self):
+        # path -> [size, mtime_ns, inode, algorithm, fingerprint] or None if the backend has no entry
+        self.path2entry = {}  # type: Dict[str, Union[List, None]]
+        self.dirty = set()  # type: Set[str]  # paths of entries which are not saved yet
+
+        self.backend = None  # entries are read from it during a run
+        self._owner = None  # backend the entries belong to
+
+    def _entry(self, path: str) -> Union[List, None]:
+        try:
+            return self.path2entry[path]
+        except KeyError:
+            pass
+
+        entry = None
+        if self.backend is not None:
+            try:
+                entry = self.backend.get_key(self.KEY_PREFIX + path)
+            except KeyError:
+                pass
+
+        self.path2entry[path] = entry
+        return entry
+
+    def get(self, path: pathlib.Path, compute: Callable[[], str]) -> str:
+        st = os.stat(path)
+        key = [st.st_size, st.st_mtime_ns, st.st_ino, hashing.get_algorithm()]
+
+        entry = self._entry(str(path))
+        if entry is not None and entry[:4] == key:
+            return entry[4]
+
+        fp = compute()
+        self.path2entry[str(path)] = key + [fp]
+        self.dirty.add(str(path))
+
+        return fp
+
+    def load(self, backend) -> None:
+        """
+        Bind to the backend at the start of a run. Entries of another backend are dropped
+        """
+        if backend is not self._owner:
+            self.clear()
+
+        self.backend = self._owner = backend
+
+    def save(self, backend) -> None:
+        """
+        Write modified entries at the end of a run, the backend is unbound
+        """
+        for path in self.dirty:
+            backend.set_key(self.KEY_PREFIX + path, self.path2entry[path])
+
+        self.dirty = set()
+        self.backend = None
+
+    def clear(self) -> None:
+        self.path2entry = {}
+        self.dirty = set()
+
+
 class File(ArtifactLabel):
+    stat_cache = FileStatCache()
+
     def __init__(self, path):
         self._path = pathlib.Path(path).resolve()
 
@@ -67,12 +205,10 @@ class File(ArtifactLabel):
         return self._path
 
     def fingerprint(self) -> str:
-        with self._path.open("rb") as f:
-            file_hash = hashlib.md5()
-            while chunk := f.read(8192):
-                file_hash.update(chunk)
+        return self.stat_cache.get(self._path, self._compute_fingerprint)
 
-        return file_hash.hexdigest()
+    def _compute_fingerprint(self) -> str:
+        return hashing.hash_file(self._path)
 
     def exists(self) -> bool:
         return self._path.exists() and self._path.is_file()
@@ -83,9 +219,114 @@ class File(ArtifactLabel):
     def prepare_for_function_call(self):
         return self
 
+    def store(self, path: pathlib.Path) -> None:
+        shutil.copyfile(self._path, path)
+
+    def restore(self, path: pathlib.Path) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, self._path)
+
+
+class FileGlob(ArtifactLabel):
+    """
+    Set of files matching the pattern (recursive "**" patterns are supported), see DAG.map_task.
+    The listing with stat info of the files processed by the last successful run (index) is kept in the backend
+    of the run for every task, so only added, modified and removed files are processed by the following runs.
+    """
+
+    def __init__(self, directory, pattern: str):
+        self.directory = pathlib.Path(directory).resolve()
+        self.pattern = pattern
+
+        self._current = None  # type: Union[Dict[str, List[int]], None]  # path -> [size, mtime_ns, inode]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_current"] = None
+        return state
+
+    def _index_key(self, name: str) -> str:
+        return f"{self.label()}: index of {name}"
+
+    def scan(self) -> Dict[str, List[int]]:
+        """
+        Current listing, it is used by `save_index` until the next scan
+        """
+        self._current = self.listing()
+        return self._current
+
+    def listing(self) -> Dict[str, List[int]]:
+        """
+        Path -> [size, mtime_ns, inode] of the matching files
+        """
+        res = {}
+
+        for path in glob.iglob(os.path.join(glob.escape(str(self.directory)), self.pattern), recursive=True):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            if stat.S_ISREG(st.st_mode):
+                res[path] = [st.st_size, st.st_mtime_ns, st.st_ino]
+
+        return res
+
+    def index(self, backend, name: str) -> Dict[str, List[int]]:
+        """
+        :param name: name of the task processing the files
+        """
+        try:
+            return backend.get_key(self._index_key(name))
+        except KeyError:
+            return {}
+
+    @staticmethod
+    def changes(index: Dict[str, List[int]], current: Dict[str, List[int]]) -> Tuple[List[str], List[str]]:
+        """
+        Paths of added or modified files and paths of removed files of the `current` listing since the index
+        """
+        changed = [path for path, entry in current.items() if index.get(path) != entry]
+        removed = [path for path in index if path not in current]
+
+        return sorted(changed), sorted(removed)
+
+    def save_index(self, backend, name: str, listing: Dict[str, List[int]] = None) -> None:
+        """
+        :param listing: processed listing, the last scan by default
+        """
+        if listing is None:
+            listing = self._current
+
+        if listing is not None:
+            backend.set_key(self._index_key(name), listing)
+
+    def listing_fingerprint(self, listing: Dict[str, List[int]] = None) -> str:
+        """
+        :param listing: processed listing, the last scan by default
+        """
+        if listing is None:
+            listing = self._current
+
+        data = json.dumps(sorted(listing.items()), separators=(",", ":"))
+        return hashing.hash_bytes(data.encode('utf-8'))
+
+    def fingerprint(self) -> str:
+        return self.listing_fingerprint(self.scan())
+
+    def exists(self) -> bool:
+        return self.directory.is_dir()
+
+    def label(self) -> str:
+        return f"[FileGlob] {self.directory / self.pattern}"
+
+    def __str__(self):
+        return f"<FileGlob: {self.directory / self.pattern}>"
+
 
 class InMemoryArtifact(ArtifactLabel):
-    label2data = {}  # type: Dict[str, str]
+    # shared by all the artifacts, may be replaced with store.SpillingStore to limit memory usage
+    label2data = ArtifactStore()  # type: ArtifactStore
 
     def __init__(self, label):
         self._label = label
@@ -97,9 +338,7 @@ class InMemoryArtifact(ArtifactLabel):
     def fingerprint(self) -> str:
         self._fingerprint_calls += 1
 
-        file_hash = hashlib.md5()
-        file_hash.update(self.label2data[self._label].encode('utf-8'))
-        return file_hash.hexdigest()
+        return self.label2data.fingerprint(self._label)
 
     def exists(self) -> bool:
         return self._label in self.label2data
@@ -107,5 +346,18 @@ class InMemoryArtifact(ArtifactLabel):
     def label(self) -> str:
         return self._label
 
-    def put_data(self, data: str):
+    def put_data(self, data):
+        """
+        :param data: str, bytes-like object (bytes, memoryview, NumPy array, ...) or any picklable object.
+            It is not copied and must not be modified afterwards: its fingerprint is computed here once.
+        """
         self.label2data[self._label] = data
+        self.label2data.fingerprint(self._label)
+
+    def store(self, path: pathlib.Path) -> None:
+        with open(path, 'wb') as fp:
+            dump_value(self.label2data[self._label], fp)
+
+    def restore(self, path: pathlib.Path) -> None:
+        with open(path, 'rb') as fp:
+            self.put_data(load_value(fp))
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from .artifact import File, FileStatCache
+from .backend import DictBackend
+
+
+class FileStatCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "a.txt"
+        self.path.write_text("hello")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get(self):
+        cache = FileStatCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "fp%d" % len(calls)
+
+        self.assertEqual("fp1", cache.get(self.path, compute))
+        self.assertEqual("fp1", cache.get(self.path, compute))
+        self.assertEqual(1, len(calls))
+
+        # same size, different mtime
+        self.path.write_text("world")
+        st = self.path.stat()
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual("fp2", cache.get(self.path, compute))
+        self.assertEqual(2, len(calls))
+
+    def test_persistence(self):
+        backend = DictBackend("main", None)
+
+        cache = FileStatCache()
+        cache.get(self.path, lambda: "fp")
+        cache.save(backend)
+        self.assertFalse(cache.dirty)
+
+        other = FileStatCache()
+        other.load(backend)
+        self.assertEqual("fp", other.get(self.path, lambda: "recomputed"))
+
+    def test_per_path_entries(self):
+        written = []
+
+        class Back(DictBackend):
+            def set_key(self, key, val):
+                written.append(key)
+                super().set_key(key, val)
+
+        paths = [Path(self.tmp.name) / f"{i}.txt" for i in range(5)]
+        for p in paths:
+            p.write_text(p.name)
+
+        backend = Back("main", None)
+        cache = FileStatCache()
+
+        cache.load(backend)
+        for p in paths:
+            cache.get(p, lambda: "fp")
+        cache.save(backend)
+        self.assertEqual(5, len(written))
+
+        # only the re-hashed file is written
+        written.clear()
+        paths[0].write_text("changed")
+
+        cache.load(backend)
+        for p in paths:
+            cache.get(p, lambda: "fp")
+        cache.save(backend)
+        self.assertEqual([FileStatCache.KEY_PREFIX + str(paths[0])], written)
+
+    def test_scoped_to_backend(self):
+        first, second = DictBackend("main", None), DictBackend("main", None)
+        other_path = Path(self.tmp.name) / "b.txt"
+        other_path.write_text("b")
+
+        cache = FileStatCache()
+
+        cache.load(first)
+        cache.get(self.path, lambda: "fp")
+        cache.save(first)
+
+        cache.load(second)
+        cache.get(other_path, lambda: "fp")
+        cache.save(second)
+
+        self.assertEqual([FileStatCache.KEY_PREFIX + str(other_path)], list(second.d["KV"]))
+
+        # entries are read from the bound backend
+        cache.load(first)
+        self.assertEqual("fp", cache.get(self.path, lambda: "recomputed"))
+
+    def test_file_fingerprint(self):
+        a = File(self.path)
+        fp = a.fingerprint()
+
+        self.assertEqual(fp, a.fingerprint())
+        self.assertEqual(fp, File.stat_cache.path2entry[str(a.path)][4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,27 @@
 import json
+import os
+import struct
 from abc import ABC
-from typing import Union
+from typing import Union, Iterable, Dict
+
+
+class _RunWithRecord:
+    """
+    Run-with record of a task read key by key with Backend.get_task_run_with
+    """
+
+    def __init__(self, backend: "Backend", task_name: str):
+        self.backend = backend
+        self.task_name = task_name
+
+    def __getitem__(self, artifact_label: str) -> str:
+        return self.backend.get_task_run_with(self.task_name, artifact_label)
+
+    def get(self, artifact_label: str, default=None):
+        try:
+            return self[artifact_label]
+        except KeyError:
+            return default
 
 
 class Backend(ABC):
@@ -10,12 +31,49 @@ class Backend(ABC):
     def get_task_run_with(self, task_name: str, artifact_label: str) -> str:
         raise NotImplementedError()
 
+    def get_many_run_with(self, task_names: Iterable[str]) -> Dict[str, dict]:
+        """
+        Run-with records of several tasks at once: task name -> {artifact label or task name: fingerprint}.
+        Tasks without a record are omitted.
+
+        By default records are read lazily, key by key, with get_task_run_with
+        (and every task is present: missing keys raise KeyError).
+        """
+        return {task_name: _RunWithRecord(self, task_name) for task_name in task_names}
+
     def get_task_fingerprint(self, task_name: str) -> str:
         raise NotImplementedError()
 
     def set_task_fingerprint(self, task_name: str, fingerprint: str) -> None:
         raise NotImplementedError()
 
+    def get_task_stats(self, task_name: str) -> dict:
+        """
+        Stats of the last execution of the task, e.g. {"duration": seconds}.
+        Backends which do not keep stats raise KeyError as for never executed tasks.
+        """
+        raise KeyError(task_name)
+
+    def set_task_stats(self, task_name: str, stats: dict) -> None:
+        """
+        Stats are dropped by backends which do not keep them
+        """
+        pass
+
+    def set_many(self, run_with: Dict[str, dict] = None, fingerprints: Dict[str, str] = None,
+                 stats: Dict[str, dict] = None) -> None:
+        """
+        Several updates at once, each argument maps task name to its new value
+        """
+        for task_name, val in (run_with or {}).items():
+            self.set_task_run_with(task_name, val)
+
+        for task_name, val in (fingerprints or {}).items():
+            self.set_task_fingerprint(task_name, val)
+
+        for task_name, val in (stats or {}).items():
+            self.set_task_stats(task_name, val)
+
     def flush(self):
         raise NotImplementedError()
 
@@ -27,18 +85,79 @@ class Backend(ABC):
 
 
 class DictBackend(Backend):
-    def __init__(self, dag_name: str, filename: Union[str, None]):
+    """
+    Whole state is kept in memory as a nested dict and saved as JSON.
+
+    In journal mode flush only appends modified tasks and keys to `<filename>.journal`.
+    The journal is merged into the JSON snapshot when it grows larger than `compact_threshold` bytes.
+    Snapshot is replaced atomically, so a crash never leaves a truncated state file.
+
+    With `codec` (for example codec.BinaryCodec) snapshot and journal records are stored in its format instead of JSON.
+    """
+    JOURNAL_HEADER = struct.Struct("<I")
+
+    def __init__(self, dag_name: str, filename: Union[str, None], journal=False, compact_threshold=16 * 2 ** 20,
+                 codec=None):
         self.dag_name = dag_name
         self.filename = filename
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        self.codec = codec
         self.d = dict()
 
+        self._dirty_tasks = set()
+        self._dirty_keys = set()
+
         if filename is not None:
             try:
-                with open(filename, encoding='utf-8', mode='r') as fp:
-                    self.d = json.load(fp)
+                with open(filename, mode='rb') as fp:
+                    self.d = self._loads(fp.read())
             except FileNotFoundError:
                 pass
 
+            self._replay_journal()
+
+    def _dumps(self, obj, indent=None) -> bytes:
+        if self.codec is None:
+            return json.dumps(obj, indent=indent, ensure_ascii=False).encode('utf-8')
+
+        return self.codec.encode(obj)
+
+    def _loads(self, data: bytes):
+        if self.codec is None:
+            return json.loads(data.decode('utf-8'))
+
+        return self.codec.decode(data)
+
+    @property
+    def journal_filename(self):
+        return self.filename + ".journal"
+
+    def _replay_journal(self):
+        try:
+            with open(self.journal_filename, mode='rb') as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            return
+
+        pos = 0
+        while pos + self.JOURNAL_HEADER.size <= len(data):
+            size, = self.JOURNAL_HEADER.unpack_from(data, pos)
+            end = pos + self.JOURNAL_HEADER.size + size
+            if end > len(data):
+                break
+
+            record = self._loads(data[pos + self.JOURNAL_HEADER.size:end])
+            self._get_key(record["dag_name"], "tasks", create=True).update(record["tasks"])
+            self._get_key("KV", create=True).update(record["KV"])
+
+            pos = end
+
+        if pos != len(data):
+            # drop the record interrupted by a crash, new records are appended after the last complete one
+            with open(self.journal_filename, mode='r+b') as fp:
+                fp.truncate(pos)
+
     def _get_key(self, *args, create=False):
         c = self.d
 
@@ -53,6 +172,7 @@ class DictBackend(Backend):
     def set_task_run_with(self, task_name: str, artifact_label2fingerprint: dict) -> None:
         c = self._get_key(self.dag_name, "tasks", task_name, create=True)
         c["dependencies_when_called"] = artifact_label2fingerprint.copy()
+        self._dirty_tasks.add(task_name)
 
     def get_task_run_with(self, task_name: str, artifact_label: str) -> str:
         return self._get_key(
@@ -64,6 +184,15 @@ class DictBackend(Backend):
             create=False
         )
 
+    def get_many_run_with(self, task_names: Iterable[str]) -> Dict[str, dict]:
+        tasks = self.d.get(self.dag_name, {}).get("tasks", {})
+
+        return {
+            task_name: tasks[task_name]["dependencies_when_called"]
+            for task_name in task_names
+            if "dependencies_when_called" in tasks.get(task_name, ())
+        }
+
     def get_task_fingerprint(self, task_name: str) -> None:
         c = self._get_key(self.dag_name, "tasks", task_name, "fingerprint")
         return c
@@ -71,15 +200,252 @@ class DictBackend(Backend):
     def set_task_fingerprint(self, task_name: str, fingerprint: str) -> None:
         c = self._get_key(self.dag_name, "tasks", task_name, create=True)
         c["fingerprint"] = fingerprint
+        self._dirty_tasks.add(task_name)
+
+    def get_task_stats(self, task_name: str) -> dict:
+        return self._get_key(self.dag_name, "tasks", task_name, "stats")
+
+    def set_task_stats(self, task_name: str, stats: dict) -> None:
+        c = self._get_key(self.dag_name, "tasks", task_name, create=True)
+        c["stats"] = stats.copy()
+        self._dirty_tasks.add(task_name)
 
     def flush(self):
-        if self.filename is not None:
-            with open(self.filename, encoding='utf-8', mode='w') as fp:
-                json.dump(self.d, fp, indent=' ', ensure_ascii=False)
+        if self.filename is None:
+            return
+
+        if not self.journal:
+            self.compact()
+            return
+
+        if self._dirty_tasks or self._dirty_keys:
+            tasks = self._get_key(self.dag_name, "tasks", create=True)
+            kv = self._get_key("KV", create=True)
+
+            record = self._dumps({
+                "dag_name": self.dag_name,
+                "tasks": {name: tasks[name] for name in self._dirty_tasks},
+                "KV": {key: kv[key] for key in self._dirty_keys},
+            })
+
+            with open(self.journal_filename, mode='ab') as fp:
+                fp.write(self.JOURNAL_HEADER.pack(len(record)) + record)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+            self._dirty_tasks = set()
+            self._dirty_keys = set()
+
+        if os.path.exists(self.journal_filename) and os.path.getsize(self.journal_filename) > self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """
+        Write the whole state into the snapshot file and drop the journal
+        """
+        tmp_filename = self.filename + ".tmp"
+
+        with open(tmp_filename, mode='wb') as fp:
+            fp.write(self._dumps(self.d, indent=None if self.journal else ' '))
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.replace(tmp_filename, self.filename)
+
+        try:
+            os.remove(self.journal_filename)
+        except FileNotFoundError:
+            pass
+
+        self._dirty_tasks = set()
+        self._dirty_keys = set()
 
     def get_key(self, key):
         return self.d["KV"][key]
 
     def set_key(self, key, val):
         self._get_key("KV", create=True)[key] = val
+        self._dirty_keys.add(key)
+
+
+class SqliteBackend(Backend):
+    """
+    Each task is stored in a separate row of sqlite3 database (WAL mode).
+    Rows are read lazily, only modified tasks and keys are written on flush.
+    Values are stored as JSON, or in the format of `codec` (for example codec.BinaryCodec).
+    """
+    # max number of task names in a single query (old sqlite versions allow only 999 parameters)
+    QUERY_CHUNK = 900
+
+    def __init__(self, dag_name: str, filename: Union[str, None], codec=None):
+        import sqlite3
 
+        self.dag_name = dag_name
+        self.filename = filename
+        self.codec = codec
+
+        self._conn = sqlite3.connect(":memory:" if filename is None else filename)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal")
+        with self._conn:
+            self._conn.execute("""
+                create table if not exists tasks (
+                    dag_name text not null,
+                    task_name text not null,
+                    fingerprint text,
+                    run_with text,
+                    stats text,
+                    primary key (dag_name, task_name)
+                )""")
+            columns = [row[1] for row in self._conn.execute("pragma table_info(tasks)")]
+            if "stats" not in columns:
+                self._conn.execute("alter table tasks add column stats text")
+            self._conn.execute("""
+                create table if not exists kv (
+                    key text not null primary key,
+                    value text
+                )""")
+
+        self._tasks = {}  # task_name -> {"fingerprint": str, "dependencies_when_called": dict, "stats": dict}
+        self._kv = {}
+        self._dirty_tasks = set()
+        self._dirty_keys = set()
+
+    def _dumps(self, obj):
+        if self.codec is None:
+            return json.dumps(obj, ensure_ascii=False)
+
+        return self.codec.encode(obj)
+
+    def _loads(self, data):
+        if self.codec is None:
+            return json.loads(data)
+
+        return self.codec.decode(data)
+
+    def _get_task(self, task_name: str) -> dict:
+        try:
+            return self._tasks[task_name]
+        except KeyError:
+            pass
+
+        row = self._conn.execute(
+            "select fingerprint, run_with, stats from tasks where dag_name=? and task_name=?",
+            (self.dag_name, task_name)
+        ).fetchone()
+
+        c = self._tasks[task_name] = {} if row is None else self._row2task(*row)
+        return c
+
+    def _load_tasks(self, task_names: Iterable[str]):
+        """
+        Read rows of all the tasks which are not cached yet, QUERY_CHUNK tasks per query
+        """
+        missing = [_ for _ in task_names if _ not in self._tasks]
+
+        for i in range(0, len(missing), self.QUERY_CHUNK):
+            chunk = missing[i:i + self.QUERY_CHUNK]
+
+            rows = self._conn.execute(
+                "select task_name, fingerprint, run_with, stats from tasks "
+                f"where dag_name=? and task_name in ({', '.join('?' * len(chunk))})",
+                (self.dag_name, *chunk)
+            )
+
+            for task_name, *row in rows:
+                self._tasks[task_name] = self._row2task(*row)
+
+            for task_name in chunk:
+                self._tasks.setdefault(task_name, {})
+
+    def _row2task(self, fingerprint, run_with, stats) -> dict:
+        c = {}
+
+        if fingerprint is not None:
+            c["fingerprint"] = fingerprint
+        if run_with is not None:
+            c["dependencies_when_called"] = self._loads(run_with)
+        if stats is not None:
+            c["stats"] = self._loads(stats)
+
+        return c
+
+    def set_task_run_with(self, task_name: str, artifact_label2fingerprint: dict) -> None:
+        self._get_task(task_name)["dependencies_when_called"] = artifact_label2fingerprint.copy()
+        self._dirty_tasks.add(task_name)
+
+    def get_task_run_with(self, task_name: str, artifact_label: str) -> str:
+        return self._get_task(task_name)["dependencies_when_called"][artifact_label]
+
+    def get_many_run_with(self, task_names: Iterable[str]) -> Dict[str, dict]:
+        task_names = list(task_names)
+        self._load_tasks(task_names)
+
+        return {
+            task_name: self._tasks[task_name]["dependencies_when_called"]
+            for task_name in task_names
+            if "dependencies_when_called" in self._tasks[task_name]
+        }
+
+    def get_task_fingerprint(self, task_name: str) -> str:
+        return self._get_task(task_name)["fingerprint"]
+
+    def set_task_fingerprint(self, task_name: str, fingerprint: str) -> None:
+        self._get_task(task_name)["fingerprint"] = fingerprint
+        self._dirty_tasks.add(task_name)
+
+    def get_task_stats(self, task_name: str) -> dict:
+        return self._get_task(task_name)["stats"]
+
+    def set_task_stats(self, task_name: str, stats: dict) -> None:
+        self._get_task(task_name)["stats"] = stats.copy()
+        self._dirty_tasks.add(task_name)
+
+    def flush(self):
+        rows = []
+        for task_name in self._dirty_tasks:
+            c = self._tasks[task_name]
+            run_with = c.get("dependencies_when_called")
+            stats = c.get("stats")
+            rows.append((
+                self.dag_name,
+                task_name,
+                c.get("fingerprint"),
+                None if run_with is None else self._dumps(run_with),
+                None if stats is None else self._dumps(stats),
+            ))
+
+        kv_rows = [(key, self._dumps(self._kv[key])) for key in self._dirty_keys]
+
+        with self._conn:
+            self._conn.executemany(
+                "insert into tasks (dag_name, task_name, fingerprint, run_with, stats) values (?, ?, ?, ?, ?) "
+                "on conflict (dag_name, task_name) do update "
+                "set fingerprint=excluded.fingerprint, run_with=excluded.run_with, stats=excluded.stats",
+                rows
+            )
+            self._conn.executemany("insert or replace into kv values (?, ?)", kv_rows)
+
+        self._dirty_tasks = set()
+        self._dirty_keys = set()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def get_key(self, key):
+        try:
+            return self._kv[key]
+        except KeyError:
+            pass
+
+        row = self._conn.execute("select value from kv where key=?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+
+        val = self._kv[key] = self._loads(row[0])
+        return val
+
+    def set_key(self, key, val):
+        self._kv[key] = val
+        self._dirty_keys.add(key)
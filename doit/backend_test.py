@@ -1,6 +1,83 @@
+import os
+import tempfile
 import unittest
 
-from .backend import DictBackend
+from .action import delayed
+from .artifact import InMemoryArtifact
+from .backend import Backend, DictBackend, SqliteBackend
+from .dag import DAG
+from .reporter import ExecutionReporter, TaskEvent
+
+
+class LegacyBackend(Backend):
+    """
+    Implements only the per-key methods
+    """
+
+    def __init__(self):
+        self.run_with = {}
+        self.fingerprints = {}
+        self.kv = {}
+
+    def set_task_run_with(self, task_name: str, artifact_label2fingerprint: dict) -> None:
+        self.run_with[task_name] = artifact_label2fingerprint.copy()
+
+    def get_task_run_with(self, task_name: str, artifact_label: str) -> str:
+        return self.run_with[task_name][artifact_label]
+
+    def get_task_fingerprint(self, task_name: str) -> str:
+        return self.fingerprints[task_name]
+
+    def set_task_fingerprint(self, task_name: str, fingerprint: str) -> None:
+        self.fingerprints[task_name] = fingerprint
+
+    def flush(self):
+        pass
+
+    def get_key(self, key):
+        return self.kv[key]
+
+    def set_key(self, key, val):
+        self.kv[key] = val
+
+
+class Rep(ExecutionReporter):
+    def __init__(self):
+        self.t = []
+
+    def task(self, event: TaskEvent, task_name: str, reason: str):
+        self.t.append(event)
+
+    def dag(self, event, dag_name: str):
+        pass
+
+
+class BackendTest(unittest.TestCase):
+    def test_stats_defaults(self):
+        b = Backend()
+
+        # backends without stats behave as if tasks were never executed
+        b.set_task_stats("T1", {"duration": 1.0})
+        with self.assertRaises(KeyError):
+            b.get_task_stats("T1")
+
+    def test_legacy_backend(self):
+        def foo(source: InMemoryArtifact, target: InMemoryArtifact):
+            target.put_data(InMemoryArtifact.label2data[source.label()] + "!")
+
+        src, dst = InMemoryArtifact("legacy src"), InMemoryArtifact("legacy dst")
+        src.put_data("src")
+
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+        dag.py_task("Foo", delayed(foo)(src.dep, dst.tar))
+
+        back = LegacyBackend()
+        dag.run(back)
+        dag.run(back)
+
+        self.assertEqual([TaskEvent.EXECUTE, TaskEvent.SKIP], rep.t)
+        self.assertEqual("src!", InMemoryArtifact.label2data[dst.label()])
 
 
 class DictBackendTest(unittest.TestCase):
@@ -32,3 +109,180 @@ class DictBackendTest(unittest.TestCase):
 
         with self.assertRaises(KeyError):
             self.assertEqual("1", b.get_task_run_with("T2", "A1"))
+
+    def test_many(self):
+        b = DictBackend("main", None)
+
+        b.set_many(run_with={"T1": {"A1": "1"}, "T2": {"A2": "2"}}, fingerprints={"T1": "abc"})
+        b.set_task_fingerprint("T3", "xyz")
+
+        self.assertEqual({"T1": {"A1": "1"}, "T2": {"A2": "2"}}, b.get_many_run_with(["T1", "T2", "T3", "T4"]))
+        self.assertEqual("abc", b.get_task_fingerprint("T1"))
+
+
+class DictBackendJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "state.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot(self):
+        b = DictBackend("main", self.filename)
+        b.set_task_fingerprint("T1", "abc")
+        b.flush()
+
+        self.assertFalse(os.path.exists(self.filename + ".tmp"))
+        self.assertEqual("abc", DictBackend("main", self.filename).get_task_fingerprint("T1"))
+
+    def test_journal(self):
+        b = DictBackend("main", self.filename, journal=True)
+        b.set_task_fingerprint("T1", "abc")
+        b.set_task_run_with("T1", {"A1": "1"})
+        b.set_key("K", "v")
+        b.flush()
+
+        self.assertFalse(os.path.exists(self.filename))
+        size = os.path.getsize(self.filename + ".journal")
+
+        # nothing changed: nothing is written
+        b.flush()
+        self.assertEqual(size, os.path.getsize(self.filename + ".journal"))
+
+        b.set_task_fingerprint("T2", "xyz")
+        b.flush()
+
+        b = DictBackend("main", self.filename, journal=True)
+        self.assertEqual("abc", b.get_task_fingerprint("T1"))
+        self.assertEqual("1", b.get_task_run_with("T1", "A1"))
+        self.assertEqual("xyz", b.get_task_fingerprint("T2"))
+        self.assertEqual("v", b.get_key("K"))
+
+    def test_truncated_journal(self):
+        b = DictBackend("main", self.filename, journal=True)
+        b.set_task_fingerprint("T1", "abc")
+        b.flush()
+        b.set_task_fingerprint("T2", "xyz")
+        b.flush()
+
+        # crash in the middle of the last record
+        with open(self.filename + ".journal", "r+b") as fp:
+            fp.truncate(os.path.getsize(self.filename + ".journal") - 3)
+
+        b = DictBackend("main", self.filename, journal=True)
+        self.assertEqual("abc", b.get_task_fingerprint("T1"))
+        with self.assertRaises(KeyError):
+            b.get_task_fingerprint("T2")
+
+        b.set_task_fingerprint("T3", "3")
+        b.flush()
+        self.assertEqual("3", DictBackend("main", self.filename, journal=True).get_task_fingerprint("T3"))
+
+    def test_compaction(self):
+        b = DictBackend("main", self.filename, journal=True, compact_threshold=100)
+        for i in range(10):
+            b.set_task_fingerprint(f"T{i}", "x" * 20)
+            b.flush()
+
+        # journal was merged into the snapshot at least once
+        self.assertTrue(os.path.exists(self.filename))
+
+        b = DictBackend("main", self.filename, journal=True)
+        self.assertEqual("x" * 20, b.get_task_fingerprint("T9"))
+        self.assertEqual("x" * 20, b.get_task_fingerprint("T0"))
+
+
+class SqliteBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "state.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fingerprints(self):
+        b = SqliteBackend("main", None)
+
+        b.set_task_fingerprint("T1", "abc")
+        self.assertEqual("abc", b.get_task_fingerprint("T1"))
+
+        with self.assertRaises(KeyError):
+            b.get_task_fingerprint("T2")
+
+    def test_run_with(self):
+        b = SqliteBackend("main", None)
+
+        b.set_task_run_with("T1", {"A1": "1", "A2": "2"})
+        self.assertEqual("1", b.get_task_run_with("T1", "A1"))
+
+        with self.assertRaises(KeyError):
+            b.get_task_run_with("T1", "A3")
+
+        with self.assertRaises(KeyError):
+            b.get_task_run_with("T2", "A1")
+
+    def test_persistence(self):
+        b = SqliteBackend("main", self.filename)
+        b.set_task_fingerprint("T1", "abc")
+        b.set_task_run_with("T1", {"A1": "1"})
+        b.set_task_fingerprint("T2", "xyz")
+        b.set_key("K", {"a": [1, 2]})
+        b.set_task_stats("T1", {"duration": 1.5})
+        b.close()
+
+        b = SqliteBackend("main", self.filename)
+        self.assertEqual("abc", b.get_task_fingerprint("T1"))
+        self.assertEqual("1", b.get_task_run_with("T1", "A1"))
+        self.assertEqual({"a": [1, 2]}, b.get_key("K"))
+        self.assertEqual({"duration": 1.5}, b.get_task_stats("T1"))
+        with self.assertRaises(KeyError):
+            b.get_task_stats("T2")
+        with self.assertRaises(KeyError):
+            b.get_task_run_with("T2", "A1")
+
+        # tasks of other DAGs are not visible
+        other = SqliteBackend("other", self.filename)
+        with self.assertRaises(KeyError):
+            other.get_task_fingerprint("T1")
+
+    def test_flush_dirty_only(self):
+        b = SqliteBackend("main", self.filename)
+        b.set_task_fingerprint("T1", "abc")
+        b.flush()
+        self.assertEqual(set(), b._dirty_tasks)
+
+        b.get_task_fingerprint("T1")
+        self.assertEqual(set(), b._dirty_tasks)
+
+        b.set_task_fingerprint("T1", "x")
+        self.assertEqual({"T1"}, b._dirty_tasks)
+        b.close()
+
+        self.assertEqual("x", SqliteBackend("main", self.filename).get_task_fingerprint("T1"))
+
+    def test_many(self):
+        b = SqliteBackend("main", self.filename)
+        b.set_many(
+            run_with={f"T{i}": {"A": str(i)} for i in range(5)},
+            fingerprints={f"T{i}": "abc" for i in range(6)},
+            stats={"T0": {"duration": 1.0}}
+        )
+        b.close()
+
+        b = SqliteBackend("main", self.filename)
+        b.QUERY_CHUNK = 4
+
+        queries = []
+        b._conn.set_trace_callback(queries.append)
+
+        names = [f"T{i}" for i in range(8)]
+        self.assertEqual({f"T{i}": {"A": str(i)} for i in range(5)}, b.get_many_run_with(names))
+        self.assertEqual(2, len(queries))
+
+        # all rows are cached
+        self.assertEqual("abc", b.get_task_fingerprint("T5"))
+        self.assertEqual({"duration": 1.0}, b.get_task_stats("T0"))
+        with self.assertRaises(KeyError):
+            b.get_task_fingerprint("T7")
+        self.assertEqual(2, len(queries))
@@ -0,0 +1,117 @@
+"""Content-addressed store of task targets: tasks are restored from it instead of being executed"""
+import hashlib
+import json
+import os
+import pathlib
+import re
+from typing import List, Union
+
+from .artifact import ArtifactLabel, FingerprintMemo
+from .backend import Backend
+from .task import Task, AutoUpdate
+
+
+def _stored_targets(task: Task) -> Union[List[ArtifactLabel], None]:
+    """
+    Targets which are saved in the cache, None if some of them do not support it.
+    AutoUpdate targets are updated together with the task fingerprint and are not stored.
+    """
+    res = [_ for _ in task.targets() if not isinstance(_, AutoUpdate)]
+
+    if not res or any(type(_).store is ArtifactLabel.store for _ in res):
+        return None
+
+    return res
+
+
+class ArtifactCache:
+    """
+    Directory with targets of executed tasks:
+
+    - objects/<format>/<fingerprint>: content of a target as written by its `store` (see ArtifactLabel.store_format),
+      the same content is stored once per format
+    - keys/<key>: JSON {target label: fingerprint} of an execution
+
+    Key is a hash of the task name, identity of its action, fingerprints of its dependencies and labels of its targets.
+    Only tasks with File-like targets (supporting ArtifactLabel.store/restore) are cached.
+    """
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+
+    def _object_path(self, tar: ArtifactLabel, fingerprint: str) -> pathlib.Path:
+        store_format = re.sub(r"[^\w.-]", "_", tar.store_format())
+        return self.directory / "objects" / store_format / fingerprint.replace(":", "_")
+
+    def _key_path(self, key: str) -> pathlib.Path:
+        return self.directory / "keys" / key[:2] / key
+
+    @staticmethod
+    def _write(path: pathlib.Path, write) -> None:
+        """
+        Readers never see partially written files
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def key(self, task: Task, memo: FingerprintMemo, backend: Backend) -> str:
+        """
+        Should be computed before the task is executed
+        """
+        parts = [task.name, task.action.identity()]
+        parts += sorted(f"dep {_.label()}\t{memo.fingerprint(_)}" for _ in task.dependencies())
+        parts += sorted(f"task {_.name}\t{backend.get_task_fingerprint(_.name)}" for _ in task.implicit_task_dependencies)
+        parts += sorted(f"tar {_.label()}" for _ in task.targets())
+
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def save(self, key: str, task: Task, memo: FingerprintMemo) -> bool:
+        """
+        Store targets of just executed task, returns False if they can not be cached
+        """
+        targets = _stored_targets(task)
+        if targets is None or not all(_.exists() for _ in targets):
+            return False
+
+        manifest = {}
+
+        for tar in targets:
+            fp = manifest[tar.label()] = memo.fingerprint(tar)
+
+            path = self._object_path(tar, fp)
+            if not path.exists():
+                self._write(path, tar.store)
+
+        data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        self._write(self._key_path(key), lambda path: path.write_bytes(data))
+
+        return True
+
+    def restore(self, key: str, task: Task) -> bool:
+        """
+        Restore targets saved with the same key, returns False if there are none
+        """
+        targets = _stored_targets(task)
+        if targets is None:
+            return False
+
+        try:
+            manifest = json.loads(self._key_path(key).read_bytes().decode("utf-8"))
+        except FileNotFoundError:
+            return False
+
+        paths = [self._object_path(_, manifest.get(_.label(), "")) for _ in targets]
+        if len(manifest) != len(targets) or not all(_.is_file() for _ in paths):
+            return False
+
+        for tar, path in zip(targets, paths):
+            tar.restore(path)
+
+        return True
@@ -0,0 +1,210 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from .dag import DAG
+from .backend import DictBackend
+from .artifact import InMemoryArtifact, File
+from .action import delayed
+from .cache import ArtifactCache
+from .reporter import ExecutionReporter, TaskEvent
+
+
+class Rep(ExecutionReporter):
+    def __init__(self):
+        self.t = []
+
+    def task(self, event: TaskEvent, task_name: str, reason: str):
+        self.t.append(event)
+
+    def dag(self, event, dag_name: str):
+        pass
+
+
+class TaggedFile(File):
+    """
+    Same fingerprint as File, other storage format
+    """
+
+    def store(self, path: Path) -> None:
+        path.write_bytes(b"tagged:" + self.path.read_bytes())
+
+    def restore(self, path: Path) -> None:
+        self.path.write_bytes(path.read_bytes()[len(b"tagged:"):])
+
+
+class ArtifactCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.d = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_restore(self):
+        calls = []
+
+        def build(src: File, dst: File, mem: InMemoryArtifact):
+            calls.append(dst.path.name)
+            dst.path.parent.mkdir(exist_ok=True)
+            dst.path.write_text(src.path.read_text().upper())
+            mem.put_data(dst.path.name)
+
+        src, dst = File(self.d / "src.txt"), File(self.d / "out" / "dst.txt")
+        mem = InMemoryArtifact("cache mem")
+        src.path.write_text("v1")
+
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+        dag.py_task("Build", delayed(build)(src.dep, dst.tar, mem.tar))
+
+        cache = ArtifactCache(self.d / "cache")
+
+        dag.run(DictBackend(dag.dag_name, None), cache=cache)
+        self.assertEqual(["dst.txt"], calls)
+
+        # e.g. checkout of another branch: state is lost, targets are removed
+        dst.path.unlink()
+        del InMemoryArtifact.label2data[mem.label()]
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back, cache=cache)
+        self.assertEqual(["dst.txt"], calls)
+        self.assertEqual("V1", dst.path.read_text())
+        self.assertEqual("dst.txt", InMemoryArtifact.label2data[mem.label()])
+        # one event per task
+        self.assertEqual([TaskEvent.EXECUTE, TaskEvent.RESTORE], rep.t)
+
+        # restored task is up-to-date
+        dag.run(back, cache=cache)
+        self.assertEqual(TaskEvent.SKIP, rep.t[-1])
+
+        # new dependency content is a cache miss
+        src.path.write_text("v2")
+        dag.run(back, cache=cache)
+        self.assertEqual(["dst.txt", "dst.txt"], calls)
+        self.assertEqual("V2", dst.path.read_text())
+
+        # both versions are kept
+        src.path.write_text("v1")
+        dag.run(back, cache=cache)
+        self.assertEqual(["dst.txt", "dst.txt"], calls)
+        self.assertEqual("V1", dst.path.read_text())
+
+    def test_store_formats(self):
+        def write(src: File, dst: File):
+            dst.path.write_bytes(src.path.read_bytes())
+
+        src = File(self.d / "src.txt")
+        src.path.write_text("hello")
+        plain, tagged = File(self.d / "plain.txt"), TaggedFile(self.d / "tagged.txt")
+
+        dag = DAG("main", reporter=Rep())
+        dag.py_task("Plain", delayed(write)(src.dep, plain.tar))
+        dag.py_task("Tagged", delayed(write)(src.dep, tagged.tar))
+
+        cache = ArtifactCache(self.d / "cache")
+        dag.run(DictBackend(dag.dag_name, None), cache=cache)
+
+        plain.path.unlink()
+        tagged.path.unlink()
+        dag.run(DictBackend(dag.dag_name, None), cache=cache)
+
+        self.assertEqual("hello", plain.path.read_text())
+        self.assertEqual("hello", tagged.path.read_text())
+
+    def test_file_and_memory_targets(self):
+        def to_file(src: File, dst: File):
+            dst.path.write_bytes(src.path.read_bytes())
+
+        def to_memory(src: File, dst: InMemoryArtifact):
+            dst.put_data(src.path.read_text())
+
+        src = File(self.d / "src.txt")
+        src.path.write_text("hello")
+
+        for order in ((to_file, to_memory), (to_memory, to_file)):
+            file_dst, mem_dst = File(self.d / "dst.txt"), InMemoryArtifact("cache mixed")
+            cache = ArtifactCache(self.d / f"cache {order[0].__name__}")
+
+            dag = DAG("main", reporter=Rep())
+            for func in order:
+                dag.py_task(func.__name__, delayed(func)(src.dep, (file_dst if func is to_file else mem_dst).tar))
+
+            dag.run(DictBackend(dag.dag_name, None), cache=cache)
+
+            file_dst.path.unlink()
+            del InMemoryArtifact.label2data[mem_dst.label()]
+            dag.run(DictBackend(dag.dag_name, None), cache=cache)
+
+            self.assertEqual(b"hello", file_dst.path.read_bytes())
+            self.assertEqual("hello", InMemoryArtifact.label2data[mem_dst.label()])
+
+    def test_not_cached(self):
+        calls = []
+
+        def foo():
+            calls.append(1)
+
+        dag = DAG("main", reporter=Rep())
+        dag.py_task("No targets", delayed(foo)())
+
+        cache = ArtifactCache(self.d / "cache")
+        for _ in range(2):
+            dag.run(DictBackend(dag.dag_name, None), cache=cache)
+
+        self.assertEqual([1, 1], calls)
+
+    def test_always_executed(self):
+        calls = []
+
+        def fetch(dst: File):
+            calls.append(1)
+            dst.path.write_text(str(len(calls)))
+
+        dst = File(self.d / "fetched.txt")
+
+        dag = DAG("main", reporter=Rep())
+        dag.py_task("Fetch", delayed(fetch)(dst.tar), always_execute=True)
+        dag.py_task("Fetch without dependencies", delayed(fetch)(File(self.d / "other.txt").tar))
+
+        cache = ArtifactCache(self.d / "cache")
+        back = DictBackend(dag.dag_name, None)
+        for _ in range(3):
+            dag.run(back, cache=cache)
+
+        self.assertEqual(6, len(calls))
+        self.assertFalse((self.d / "cache" / "keys").exists())
+
+    def test_action_identity(self):
+        def foo(x, target: InMemoryArtifact):
+            target.put_data(str(x))
+
+        a = InMemoryArtifact("identity")
+
+        self.assertEqual(delayed(foo)(1, a.tar).identity(), delayed(foo)(1, a.tar).identity())
+        self.assertNotEqual(delayed(foo)(1, a.tar).identity(), delayed(foo)(2, a.tar).identity())
+        self.assertNotEqual(delayed(foo)(1, a.tar).identity(), delayed(foo)(1, a.dep).identity())
+
+    def test_action_identity_between_processes(self):
+        script = """if True:
+            from doit.action import delayed
+            from doit.artifact import InMemoryArtifact
+
+            def foo(x, options, target):
+                return x in {"a", "b", "c"} and options
+
+            print(delayed(foo)("a", {"x", "y", "z"}, InMemoryArtifact("identity").tar).identity())
+        """
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        identities = set()
+        for seed in ("1", "2", "3"):
+            out = subprocess.run([sys.executable, "-c", script], cwd=root, check=True, capture_output=True,
+                                 env=dict(os.environ, PYTHONHASHSEED=seed), text=True).stdout
+            identities.add(out)
+
+        self.assertEqual(1, len(identities))
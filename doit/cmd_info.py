@@ -81,8 +81,30 @@ class Info(DoitCmdBase):
                 else:
                     printer.pprint(getattr(task, attr))
 
+        task_stats = self.dep_manager.get_stats(task.name)
+        if task_stats:
+            self.outstream.write('\n{:11s}:\n'.format('stats'))
+            self.outstream.write(self.format_stats(task_stats))
+            self.outstream.write('\n')
+
         return retcode
 
+    @staticmethod
+    def format_stats(task_stats):
+        '''return string with execution stats of the last run'''
+        lines = [
+            ' - wall time: {:.3f}s'.format(task_stats['duration']),
+            ' - cpu time: {:.3f}s'.format(task_stats.get('cpu_time', 0)),
+            ' - peak rss: {:.1f} MB'.format(task_stats.get('max_rss', 0) / 2 ** 20),
+            ' - read: {} bytes'.format(task_stats.get('read_bytes', 0)),
+            ' - written: {} bytes'.format(task_stats.get('write_bytes', 0)),
+        ]
+        history = task_stats.get('history')
+        if history:
+            lines.append(' - previous wall times: {}'.format(
+                ', '.join('{:.3f}s'.format(_) for _ in history)))
+        return '\n'.join(lines)
+
     @staticmethod
     def get_reasons(reasons):
         '''return string with description of reason task is not up-to-date'''
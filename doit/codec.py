@@ -0,0 +1,237 @@
+"""Compact binary serialization of backend state"""
+import datetime
+import re
+import struct
+
+# item tags
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5  # new string, appended to the string table
+_STR_REF = 6  # index in the string table
+_DIGEST = 7  # lower case hex string stored as raw bytes
+_PREFIXED_DIGEST = 8  # "<algorithm>:<hex digest>"
+_RUN_COUNTER = 9  # "N @ <datetime>" task fingerprint
+_LIST = 10
+_DICT = 11
+_BYTES = 12
+
+_DOUBLE = struct.Struct("<d")
+
+_HEX_RE = re.compile(r"(?:[0-9a-f]{2}){8,}")
+_PREFIXED_DIGEST_RE = re.compile(r"([a-z0-9_]+):((?:[0-9a-f]{2}){8,})")
+_RUN_COUNTER_RE = re.compile(r"(\d+) @ (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d{6})?)")
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class BinaryCodec:
+    """
+    Compact binary alternative to JSONCodec.
+
+    Strings are interned: every repeated string (artifact labels, task names) is stored once per document.
+    Hex digests are stored as raw bytes and "N @ datetime" fingerprints as two integers.
+    Decoding restores exactly the same values as were encoded (tuples become lists, as in JSON).
+    """
+    MAGIC = b"DOITB\x01"
+
+    binary = True
+
+    def encode(self, data) -> bytes:
+        out = bytearray(self.MAGIC)
+        _Encoder(out).item(data)
+        return bytes(out)
+
+    def decode(self, data: bytes):
+        if not data.startswith(self.MAGIC):
+            raise ValueError("Not a doit binary document")
+
+        dec = _Decoder(data, len(self.MAGIC))
+        res = dec.item()
+
+        if dec.pos != len(data):
+            raise ValueError("Unexpected data after the end of document")
+
+        return res
+
+
+class _Encoder:
+    def __init__(self, out: bytearray):
+        self.out = out
+        self.strings = {}  # type: dict  # str -> index
+
+    def varint(self, n: int):
+        out = self.out
+        while n >= 0x80:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def svarint(self, n: int):
+        self.varint(n * 2 if n >= 0 else -n * 2 - 1)
+
+    def raw(self, b: bytes):
+        self.varint(len(b))
+        self.out += b
+
+    def string(self, s: str):
+        ix = self.strings.get(s)
+        if ix is not None:
+            self.out.append(_STR_REF)
+            self.varint(ix)
+            return
+
+        self.strings[s] = len(self.strings)
+        self.out.append(_STR)
+        self.raw(s.encode("utf-8"))
+
+    def str_item(self, s: str):
+        if _HEX_RE.fullmatch(s):
+            self.out.append(_DIGEST)
+            self.raw(bytes.fromhex(s))
+            return
+
+        m = _PREFIXED_DIGEST_RE.fullmatch(s)
+        if m:
+            self.out.append(_PREFIXED_DIGEST)
+            self.string(m.group(1))
+            self.raw(bytes.fromhex(m.group(2)))
+            return
+
+        m = _RUN_COUNTER_RE.fullmatch(s)
+        if m:
+            dt = datetime.datetime.fromisoformat(m.group(2))
+            if str(dt) == m.group(2):
+                self.out.append(_RUN_COUNTER)
+                self.varint(int(m.group(1)))
+                self.svarint((dt - _EPOCH) // datetime.timedelta(microseconds=1))
+                return
+
+        self.string(s)
+
+    def item(self, x):
+        out = self.out
+
+        if x is None:
+            out.append(_NONE)
+        elif x is True:
+            out.append(_TRUE)
+        elif x is False:
+            out.append(_FALSE)
+        elif isinstance(x, int):
+            out.append(_INT)
+            self.svarint(x)
+        elif isinstance(x, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(x)
+        elif isinstance(x, str):
+            self.str_item(x)
+        elif isinstance(x, (list, tuple)):
+            out.append(_LIST)
+            self.varint(len(x))
+            for v in x:
+                self.item(v)
+        elif isinstance(x, dict):
+            out.append(_DICT)
+            self.varint(len(x))
+            for k, v in x.items():
+                self.item(k)
+                self.item(v)
+        elif isinstance(x, (bytes, bytearray)):
+            out.append(_BYTES)
+            self.raw(bytes(x))
+        else:
+            raise TypeError(f"Object of type {x.__class__.__name__} is not serializable")
+
+
+class _Decoder:
+    def __init__(self, data: bytes, pos: int):
+        self.data = data
+        self.pos = pos
+        self.strings = []
+
+    def byte(self) -> int:
+        try:
+            b = self.data[self.pos]
+        except IndexError:
+            raise ValueError("Unexpected end of document")
+        self.pos += 1
+        return b
+
+    def varint(self) -> int:
+        n = shift = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def svarint(self) -> int:
+        n = self.varint()
+        return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+    def raw(self) -> bytes:
+        size = self.varint()
+        end = self.pos + size
+        if end > len(self.data):
+            raise ValueError("Unexpected end of document")
+        b = self.data[self.pos:end]
+        self.pos = end
+        return b
+
+    def string(self) -> str:
+        tag = self.byte()
+        if tag == _STR:
+            s = self.raw().decode("utf-8")
+            self.strings.append(s)
+            return s
+        if tag == _STR_REF:
+            return self.strings[self.varint()]
+        raise ValueError(f"Expected string, got tag {tag}")
+
+    def item(self):
+        tag = self.data[self.pos] if self.pos < len(self.data) else None
+
+        if tag in (_STR, _STR_REF):
+            return self.string()
+
+        tag = self.byte()
+
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            return self.svarint()
+        if tag == _FLOAT:
+            if self.pos + _DOUBLE.size > len(self.data):
+                raise ValueError("Unexpected end of document")
+            v, = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += _DOUBLE.size
+            return v
+        if tag == _DIGEST:
+            return self.raw().hex()
+        if tag == _PREFIXED_DIGEST:
+            algorithm = self.string()
+            return f"{algorithm}:{self.raw().hex()}"
+        if tag == _RUN_COUNTER:
+            ix = self.varint()
+            dt = _EPOCH + datetime.timedelta(microseconds=self.svarint())
+            return f"{ix} @ {dt}"
+        if tag == _LIST:
+            return [self.item() for _ in range(self.varint())]
+        if tag == _DICT:
+            res = {}
+            for _ in range(self.varint()):
+                k = self.item()
+                res[k] = self.item()
+            return res
+        if tag == _BYTES:
+            return self.raw()
+
+        raise ValueError(f"Unknown tag {tag}")
@@ -0,0 +1,95 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from .backend import DictBackend, SqliteBackend
+from .codec import BinaryCodec
+from .dependency import JsonDB, SqliteDB
+
+
+class BinaryCodecTest(unittest.TestCase):
+    def test_roundtrip(self):
+        data = {
+            "EOD": {"tasks": {
+                "Task 1": {
+                    "fingerprint": f"3 @ {datetime.datetime(2020, 1, 2, 3, 4, 5, 6)}",
+                    "dependencies_when_called": {
+                        "[File] /a/b.txt": "d41d8cd98f00b204e9800998ecf8427e",
+                        "Task 0": f"0 @ {datetime.datetime(2020, 1, 2)}",
+                        "blake": "blake2b:" + "ab" * 64,
+                    },
+                },
+                "Task 2": {"dependencies_when_called": {"[File] /a/b.txt": "D41D8CD98F00B204E9800998ECF8427E"}},
+            }},
+            "KV": {"x": [1, -2, 3.5, None, True, False, "", "abc", 2 ** 70, b"\x00raw"]},
+        }
+
+        codec = BinaryCodec()
+        self.assertEqual(data, codec.decode(codec.encode(data)))
+
+    def test_size(self):
+        data = {f"Task {i}": {
+            "fingerprint": f"{i} @ {datetime.datetime(2020, 1, 2, 3, 4, 5, 6)}",
+            "dependencies_when_called": {f"[File] /data/input_{j}.parquet": "d41d8cd98f00b204e9800998ecf8427e"
+                                         for j in range(10)},
+        } for i in range(100)}
+
+        self.assertLess(len(BinaryCodec().encode(data)) * 3, len(json.dumps(data)))
+
+    def test_corrupted(self):
+        codec = BinaryCodec()
+
+        with self.assertRaises(ValueError):
+            codec.decode(b'{"a": 1}')
+
+        with self.assertRaises(ValueError):
+            codec.decode(codec.encode({"a": "b"})[:-1])
+
+
+class CodecBackendsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_dict_backend(self):
+        filename = os.path.join(self.tmp.name, "state.bin")
+
+        for journal in (False, True):
+            b = DictBackend("main", filename, journal=journal, codec=BinaryCodec())
+            b.set_task_fingerprint("T1", f"0 @ {datetime.datetime.utcnow()}")
+            b.set_task_run_with("T1", {"A": "d41d8cd98f00b204e9800998ecf8427e"})
+            b.flush()
+
+            b = DictBackend("main", filename, journal=journal, codec=BinaryCodec())
+            self.assertEqual("d41d8cd98f00b204e9800998ecf8427e", b.get_task_run_with("T1", "A"))
+
+    def test_sqlite_backend(self):
+        filename = os.path.join(self.tmp.name, "state.sqlite")
+
+        b = SqliteBackend("main", filename, codec=BinaryCodec())
+        b.set_task_run_with("T1", {"A": "d41d8cd98f00b204e9800998ecf8427e"})
+        b.set_key("K", {"a": 1})
+        b.close()
+
+        b = SqliteBackend("main", filename, codec=BinaryCodec())
+        self.assertEqual("d41d8cd98f00b204e9800998ecf8427e", b.get_task_run_with("T1", "A"))
+        self.assertEqual({"a": 1}, b.get_key("K"))
+
+    def test_legacy_dbs(self):
+        for db_class in (JsonDB, SqliteDB):
+            filename = os.path.join(self.tmp.name, db_class.__name__)
+
+            db = db_class(filename, BinaryCodec())
+            db.set("T1", "dep", "d41d8cd98f00b204e9800998ecf8427e")
+            db.dump()
+
+            db = db_class(filename, BinaryCodec())
+            self.assertEqual("d41d8cd98f00b204e9800998ecf8427e", db.get("T1", "dep"))
+
+
+if __name__ == '__main__':
+    unittest.main()
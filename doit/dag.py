@@ -1,15 +1,76 @@
+import asyncio
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from itertools import chain
 from typing import Any, Union, List, Dict, Set
 
-from graphlib import TopologicalSorter
-from collections import defaultdict
+from graphlib import CycleError
+from collections import defaultdict, OrderedDict
 
-from .action import PythonAction
-from .task import Task
-from .artifact import ArtifactLabel
+import loguru
+
+from .action import PythonAction, MapAction, BatchAction
+from .task import Task, execute_action, execute_batch
+from .artifact import ArtifactLabel, File, FingerprintMemo, FileGlob
 from .backend import Backend
-from .reporter import LogExecutionReporter, ExecutionReporter, DagEvent
+from .reporter import LogExecutionReporter, ExecutionReporter, DagEvent, SpanEvent, TraceExecutionReporter, TaskEvent
+from .cache import ArtifactCache
 from .node import Node
+from .stats import worker_name
+from .watch import create_watcher
+from .workers import WorkerPool
+
+
+async def _execute_action_async(action) -> dict:
+    """
+    CPU and I/O of the coroutines running simultaneously in the same thread are not separated,
+    so only the wall time is measured
+    """
+    started = time.time()
+    start = time.perf_counter()
+    await action.execute_async()
+    return {"duration": time.perf_counter() - start, "started": started, "worker": worker_name()}
+
+
+async def _execute_async(task: Task, semaphores: Dict[str, asyncio.Semaphore]) -> dict:
+    if task.resource in semaphores:
+        async with semaphores[task.resource]:
+            return await _execute_action_async(task.action)
+
+    return await _execute_action_async(task.action)
+
+
+def _get_subgraph(dep_graph: Dict[str, List[str]], labels: Set[str]) -> Dict[str, List[str]]:
+    """
+    Part of dep_graph required to build labels. Each node is visited once, so diamonds are fine.
+    """
+    res = {}
+
+    visited = set(labels)
+    front = list(visited)
+
+    while front:
+        f = front.pop()
+        if f in dep_graph:
+            res[f] = dep_graph[f]
+            for x in dep_graph[f]:
+                if x not in visited:
+                    visited.add(x)
+                    front.append(x)
+
+    return res
+
+
+def _all_nodes(dep_graph: Dict[str, List[str]]) -> Set[str]:
+    res = set()
+
+    for k, v in dep_graph.items():
+        res.add(k)
+        res.update(v)
+
+    return res
 
 
 class DepGraph:
@@ -22,29 +83,10 @@ class DepGraph:
         self.label2node = label2node
 
     def subgraph(self, labels: Set[str]):
-        front = labels
-
-        res = defaultdict(list)
-
-        while front:
-            new_front = set()
-            for f in front:
-                assert f not in res
-                if f in self.dep_graph:
-                    res[f] = self.dep_graph[f]
-                    new_front.update(self.dep_graph[f])
-            front = new_front
-
-        return DepGraph(res)
+        return DepGraph(_get_subgraph(self.dep_graph, labels), self.label2node)
 
     def all_nodes(self):
-        res = set()
-
-        for k, v in self.dep_graph.items():
-            res.update([k])
-            res.update(v)
-
-        return res
+        return _all_nodes(self.dep_graph)
 
     def edges(self):
         """
@@ -56,15 +98,291 @@ class DepGraph:
                 yield k, v
 
 
+class CompiledGraph:
+    """
+    Dependency graph with integer node ids and adjacency lists.
+    Built once by DAG and reused by all the following runs.
+    """
+    SELECTION_CACHE_SIZE = 256
+
+    def __init__(self, dep_graph: DepGraph, name2task: Dict[str, Task]):
+        # in insertion order as graphlib.TopologicalSorter: ids and order of ready nodes do not depend on hashing
+        self.labels = list(dict.fromkeys(chain.from_iterable(
+            [head, *tails] for head, tails in dep_graph.dep_graph.items()
+        )))  # type: List[str]
+        self.label2id = {label: i for i, label in enumerate(self.labels)}  # type: Dict[str, int]
+        self.tasks = [name2task.get(label) for label in self.labels]  # type: List[Union[Task, None]]
+
+        self.dependencies = [[] for _ in self.labels]  # type: List[List[int]]
+        self.dependents = [[] for _ in self.labels]  # type: List[List[int]]
+
+        for head, tails in dep_graph.dep_graph.items():
+            i = self.label2id[head]
+            for tail in dict.fromkeys(tails):
+                j = self.label2id[tail]
+                self.dependencies[i].append(j)
+                self.dependents[j].append(i)
+
+        self.indegree = [len(_) for _ in self.dependencies]
+
+        self._selection_cache = OrderedDict()  # type: OrderedDict[frozenset, frozenset]
+
+        self._check_cycles()
+
+    def _check_cycles(self):
+        npredecessors = list(self.indegree)
+        front = [i for i, n in enumerate(npredecessors) if n == 0]
+        self.order = []  # type: List[int]  # topological order
+
+        while front:
+            i = front.pop()
+            self.order.append(i)
+            for j in self.dependents[i]:
+                npredecessors[j] -= 1
+                if npredecessors[j] == 0:
+                    front.append(j)
+
+        if len(self.order) != len(self.labels):
+            cycle = [self.labels[i] for i, n in enumerate(npredecessors) if n > 0]
+            raise CycleError("nodes are in a cycle", cycle)
+
+    def select(self, labels: Set[str]) -> frozenset:
+        """
+        Ids of the nodes required to build labels (labels themselves included).
+        Results of recent queries are cached.
+        """
+        key = frozenset(labels)
+
+        try:
+            self._selection_cache.move_to_end(key)
+            return self._selection_cache[key]
+        except KeyError:
+            pass
+
+        res = self._selection_cache[key] = self._select(key)
+        if len(self._selection_cache) > self.SELECTION_CACHE_SIZE:
+            self._selection_cache.popitem(last=False)
+
+        return res
+
+    def _select(self, labels: frozenset) -> frozenset:
+        res = set(self.label2id[_] for _ in labels if _ in self.label2id)
+        front = list(res)
+
+        while front:
+            i = front.pop()
+            for j in self.dependencies[i]:
+                if j not in res:
+                    res.add(j)
+                    front.append(j)
+
+        return frozenset(res)
+
+    def affected(self, nodes: Set[int]) -> frozenset:
+        """
+        Ids of the nodes depending on the nodes (directly or not), nodes themselves included
+        """
+        res = set(nodes)
+        front = list(res)
+
+        while front:
+            i = front.pop()
+            for j in self.dependents[i]:
+                if j not in res:
+                    res.add(j)
+                    front.append(j)
+
+        return frozenset(res)
+
+    def critical_path(self, weights: Dict[int, float]) -> List[float]:
+        """
+        Node id -> weight of the heaviest path from the node to any of the final nodes (node itself included)
+
+        :param weights: node id -> weight (e.g. duration of task), missing nodes weight nothing
+        """
+        res = [0.0] * len(self.labels)
+
+        for i in reversed(self.order):
+            res[i] = weights.get(i, 0.0) + max((res[j] for j in self.dependents[i]), default=0.0)
+
+        return res
+
+    def scheduler(self, selected: Set[int] = None, priority: List[float] = None, partial=False) -> "_Scheduler":
+        """
+        :param partial: selected nodes may miss some of their dependencies, they are considered done
+        """
+        return _Scheduler(self, range(len(self.labels)) if selected is None else selected, priority, partial)
+
+
+class _Scheduler:
+    """
+    Yields node ids of CompiledGraph in topological order.
+    Same protocol as graphlib.TopologicalSorter: get_ready(), done(), is_active().
+    Node set should contain all the dependencies of its nodes (see CompiledGraph.select),
+    unless it is partial: then dependencies outside of the set are considered done.
+    With priority, ready nodes are returned highest priority first.
+    """
+
+    def __init__(self, graph: CompiledGraph, nodes, priority: List[float] = None, partial=False):
+        self.graph = graph
+        self.priority = priority
+
+        if partial:
+            nodes = set(nodes)
+            self.npredecessors = {i: sum(1 for j in graph.dependencies[i] if j in nodes) for i in nodes}
+        else:
+            self.npredecessors = {i: graph.indegree[i] for i in nodes}
+        self.ready = [i for i, n in self.npredecessors.items() if n == 0]
+        self.n_active = len(self.npredecessors)
+        self.finished = set()  # type: Set[int]
+
+    def is_active(self) -> bool:
+        return self.n_active > 0
+
+    def get_ready(self) -> List[int]:
+        res, self.ready = self.ready, []
+
+        if self.priority is not None:
+            res.sort(key=self.priority.__getitem__, reverse=True)
+
+        return res
+
+    def unfinished(self) -> Set[int]:
+        """
+        Nodes not marked as done, e.g. after a failure
+        """
+        return set(self.npredecessors) - self.finished
+
+    def done(self, i: int) -> None:
+        self.n_active -= 1
+        self.finished.add(i)
+
+        npredecessors = self.npredecessors
+        for j in self.graph.dependents[i]:
+            if j in npredecessors:
+                npredecessors[j] -= 1
+                if npredecessors[j] == 0:
+                    self.ready.append(j)
+
+
+class _Run:
+    """
+    State of a single run, shared by sequential, parallel and async executions
+    """
+
+    def __init__(self, graph: CompiledGraph, ts: _Scheduler, backend: Backend, reporter: ExecutionReporter,
+                 run_with: Dict[str, dict], cache: Union[ArtifactCache, None]):
+        self.graph = graph
+        self.ts = ts
+        self.backend = backend
+        self.reporter = reporter
+        self.memo = FingerprintMemo(reporter)
+        # records of the selected tasks prefetched in one go, each one is read only before the task is executed
+        self.run_with = run_with
+        self.cache = cache
+        self.cache_keys = {}  # type: Dict[int, str]  # keys of executing tasks
+
+    def need_execute(self, node: int) -> bool:
+        """
+        Nodes which are not tasks and up-to-date tasks are marked as done
+        """
+        task = self.graph.tasks[node]
+
+        if task is not None:
+            start = time.time()
+            event, reason, args = task.check(self.backend, self.memo, self.run_with.get(task.name, {}))
+            self.reporter.span(SpanEvent.CHECK, task.name, start, time.time() - start, worker_name())
+
+            if event == TaskEvent.EXECUTE and self._restore(node):
+                event, reason, args = TaskEvent.RESTORE, "targets are restored from cache", ()
+
+            task.report(event, reason, *args)
+
+            if event == TaskEvent.EXECUTE:
+                if isinstance(task.action, MapAction):
+                    task.action.load_index(self.backend)
+                return True
+
+        self.ts.done(node)
+        return False
+
+    def _restore(self, node: int) -> bool:
+        """
+        Restore targets of the task from cache, keeps the cache key to save the targets otherwise.
+        Tasks executed regardless of their dependencies are not cached: their key would never change.
+        """
+        task = self.graph.tasks[node]
+
+        if self.cache is None or not task.depends_on_inputs():
+            return False
+
+        key = self.cache.key(task, self.memo, self.backend)
+
+        if not self.cache.restore(key, task):
+            self.cache_keys[node] = key
+            return False
+
+        task.update_fingerprints_in_backend(self.backend, self.memo)
+        return True
+
+    def batches(self, nodes: List[int]) -> List[List[int]]:
+        """
+        Group nodes of tasks with BatchAction's of the same callable in chunks, other nodes are single
+        """
+        res = []
+        key2batch = {}
+
+        for node in nodes:
+            action = self.graph.tasks[node].action
+
+            if not isinstance(action, BatchAction):
+                res.append([node])
+                continue
+
+            batch = key2batch.get(action.batch_key())
+            if batch is None or len(batch) >= action.batch_size:
+                batch = key2batch[action.batch_key()] = []
+                res.append(batch)
+
+            batch.append(node)
+
+        return res
+
+    def executed(self, node: int, stats: dict):
+        """
+        Should be called right after the action of the task is executed
+        """
+        task = self.graph.tasks[node]
+        self.reporter.span(SpanEvent.EXECUTE, task.name, stats["started"], stats["duration"], stats["worker"])
+
+        start = time.time()
+        task.update_fingerprints_in_backend(self.backend, self.memo, stats)
+        self.reporter.span(SpanEvent.UPDATE, task.name, start, time.time() - start, worker_name())
+
+        key = self.cache_keys.pop(node, None)
+        if key is not None:
+            self.cache.save(key, task, self.memo)
+
+        self.ts.done(node)
+
+
 class DAG:
-    def __init__(self, dag_name: str, always_execute=False, reporter: ExecutionReporter = LogExecutionReporter()):
+    def __init__(self, dag_name: str, always_execute=False, reporter: ExecutionReporter = LogExecutionReporter(),
+                 early_cutoff=False):
+        """
+        :param early_cutoff: default for py_task, see Task.early_cutoff
+        """
         self.dag_name = dag_name
 
         self.always_execute = always_execute
+        self.early_cutoff = early_cutoff
         self.reporter = reporter
 
         self.name2task = {}  # type: Dict[str, Task]
 
+        self._compiled_graph = None  # type: Union[CompiledGraph, None]
+        self._worker_pool = None  # type: Union[WorkerPool, None]
+
     def __str__(self):
         return f"<DAG: {self.dag_name}>"
 
@@ -72,10 +390,12 @@ class DAG:
                 targets: List[ArtifactLabel] = (), depends_on: List[ArtifactLabel] = (),
                 depends_on_tasks: List[Task] = (),
                 always_execute=None, execute_ones=None,
-                reporter: ExecutionReporter = None):
+                reporter: ExecutionReporter = None, resource: str = None, early_cutoff=None):
 
         if always_execute is None:
             always_execute = self.always_execute
+        if early_cutoff is None:
+            early_cutoff = self.early_cutoff
         if reporter is None:
             reporter = self.reporter
 
@@ -87,23 +407,52 @@ class DAG:
                  implicit_task_dependencies=depends_on_tasks,
                  always_execute=always_execute,
                  execute_ones=execute_ones, ignore=False,
-                 execution_reporter=reporter)
+                 execution_reporter=reporter,
+                 resource=resource,
+                 early_cutoff=early_cutoff)
 
         self.name2task[t.name] = t
+        self._compiled_graph = None
 
         return t
 
+    def map_task(self, name, func, inputs: FileGlob, on_removed=None, args=(), kwargs=None,
+                 targets: List[ArtifactLabel] = (), depends_on: List[ArtifactLabel] = (), **task_kwargs):
+        """
+        Single task calling func(path, *args, **kwargs) only for files of `inputs` added or modified
+        since its last successful execution, and on_removed(path, *args, **kwargs) for removed ones.
+        Artifacts may be passed in args and kwargs with .dep and .tar as in py_task.
+
+        :param task_kwargs: other parameters of py_task
+        """
+        action = MapAction(func, inputs, on_removed, list(args), kwargs, name=name)
+        return self.py_task(name, action, targets=targets, depends_on=depends_on, **task_kwargs)
+
     def cmd_task(self):
         pass
 
     def append(self, _task: Task):
         assert _task.label() not in self.name2task
         self.name2task[_task.label()] = _task
+        self._compiled_graph = None
+
+    @property
+    def compiled_graph(self) -> CompiledGraph:
+        """
+        Built on first use, dropped when a task is added
+        """
+        if self._compiled_graph is None:
+            self.check_labels()
+            self._compiled_graph = CompiledGraph(self._create_dep_graph(), self.name2task)
+
+        return self._compiled_graph
 
     def _create_dep_graph(self) -> DepGraph:
         graph = defaultdict(list)
 
         for task in self.name2task.values():
+            graph[task.label()]  # tasks without dependencies and targets are nodes too
+
             for dep in task.dependencies():
                 graph[task.label()].append(dep.label())
             for tar in task.targets():
@@ -111,7 +460,7 @@ class DAG:
             for other in task.implicit_task_dependencies:  # type: Task
                 graph[task.label()].append(other.label())
 
-        return DepGraph(graph)
+        return DepGraph(graph, self._create_label2obj())
 
     def _create_label2obj(self) -> Dict[str, Node]:
         res = dict()  # type: Dict[str, Node]
@@ -136,30 +485,301 @@ class DAG:
         if intersection:
             raise Exception(f"Artifact shares name with task: {intersection!r}")
 
-    def run(self, backend: Backend, targets=None):
-        self.check_labels()
+    def run(self, backend: Backend, targets=None, jobs=1, executor="thread", trace: str = None,
+            cache: ArtifactCache = None):
+        """
+        Execute all tasks (or only the ones required to build targets).
+
+        :param jobs: number of tasks to execute simultaneously
+        :param executor: "thread" or "process" - type of worker pool used when jobs > 1.
+            Values of InMemoryArtifact dependencies of actions executed in a process pool are sent to the workers,
+            values of their InMemoryArtifact targets are sent back. Other changes of the main process state are lost.
+            Process pool is kept between runs until `close` is called.
+        :param trace: file name to save timeline of the run in Trace Event Format (chrome://tracing, Perfetto)
+        :param cache: targets of tasks are restored from it instead of executing the tasks if possible
+        """
+        self._run(self._prepare_run(backend, targets, trace, cache), jobs, executor, trace)
+
+    def _run(self, run: "_Run", jobs: int, executor: str, trace: Union[str, None]):
+        run.reporter.dag(DagEvent.START, self.dag_name)
+
+        if jobs > 1:
+            self._run_parallel(run, jobs, executor, self._get_worker_pool(jobs) if executor == "process" else None)
+        else:
+            self._run_sequential(run)
+
+        run.reporter.dag(DagEvent.DONE, self.dag_name)
+
+        self._finish_run(run, trace)
+
+    def watch(self, backend: Backend, targets=None, stop: threading.Event = None, jobs=1, executor="thread",
+              cache: ArtifactCache = None, poll_interval=1.0):
+        """
+        Run, then wait for changes of source files (File dependencies which are not targets of any task)
+        and re-run only the tasks depending on the changed files, until `stop` is set.
+        Changes are detected with inotify on Linux, by polling otherwise (every `poll_interval` seconds).
+        Listings of FileGlob dependencies (e.g. inputs of map tasks) are compared every `poll_interval` seconds,
+        so added, modified and removed files of their directories are noticed too.
+        Graph, stat cache and backend stay in memory between runs. Failures of runs are logged,
+        tasks which were not finished are re-run together with the ones affected by the next change.
+        """
+        graph = self.compiled_graph
+        selected = range(len(graph.labels)) if targets is None else graph.select(set(_.label() for _ in targets))
+
+        label2node = self._create_label2obj()
+        path2id = {
+            str(label2node[graph.labels[i]].path): i
+            for i in selected
+            if isinstance(label2node.get(graph.labels[i]), File) and not graph.dependencies[i]
+        }
+
+        globs = {
+            i: label2node[graph.labels[i]]
+            for i in selected
+            if isinstance(label2node.get(graph.labels[i]), FileGlob) and not graph.dependencies[i]
+        }  # type: Dict[int, FileGlob]
+        listings = {i: g.listing() for i, g in globs.items()}
+
+        watcher = create_watcher(path2id, poll_interval)
+        selected = frozenset(selected)
+        nodes = None  # first run checks all the selected tasks
+        unfinished = set()  # type: Set[int]  # nodes of the last failed run
+
+        try:
+            while stop is None or not stop.is_set():
+                if nodes is None or nodes:
+                    run = None
+                    try:
+                        run = self._prepare_run(backend, targets, None, cache, nodes)
+                        self._run(run, jobs, executor, None)
+                        unfinished = set()
+                    except Exception:
+                        loguru.logger.exception(f"Failure in {self}")
+                        if run is not None:
+                            unfinished = run.ts.unfinished()
+                        else:
+                            unfinished = set(selected if nodes is None else nodes)
+
+                timeout = None if stop is None and not globs else poll_interval
+                changed = {path2id[_] for _ in watcher.wait(timeout=timeout)}
+
+                for i, g in globs.items():
+                    listing = g.listing()
+                    if listing != listings[i]:
+                        listings[i] = listing
+                        changed.add(i)
+
+                nodes = (graph.affected(changed) & selected) | unfinished if changed else set()
+        finally:
+            watcher.close()
+
+    async def async_run(self, backend: Backend, targets=None, limits: Dict[str, int] = None, trace: str = None,
+                        cache: ArtifactCache = None):
+        """
+        Execute tasks concurrently in the running event loop: `async def` actions are awaited,
+        other actions are executed in separate threads.
+        Up-to-date checks and backend updates are the same as in `run`.
+
+        :param limits: resource group -> max number of tasks of this group running simultaneously
+            (see `resource` parameter of `py_task`). Tasks without a group are not limited.
+        :param trace: see `run`
+        :param cache: see `run`
+        """
+        run = self._prepare_run(backend, targets, trace, cache)
+        ts = run.ts
+
+        semaphores = {group: asyncio.Semaphore(n) for group, n in (limits or {}).items()}
+        running = {}  # type: Dict[asyncio.Future, int]
+
+        run.reporter.dag(DagEvent.START, self.dag_name)
+
+        try:
+            while ts.is_active():
+                for node in ts.get_ready():
+                    if run.need_execute(node):
+                        running[asyncio.ensure_future(_execute_async(run.graph.tasks[node], semaphores))] = node
+
+                if not running:
+                    continue
 
-        graph = self._create_dep_graph()
-        if targets is not None:
-            graph = graph.subgraph(set(_.label() for _ in targets))
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
 
-        ts = TopologicalSorter(graph.dep_graph)
-        ts.prepare()
+                for future in finished:
+                    node = running.pop(future)
+                    run.executed(node, future.result())
+        except BaseException:
+            for future in running:
+                future.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+
+        run.reporter.dag(DagEvent.DONE, self.dag_name)
+
+        self._finish_run(run, trace)
+
+    def _prepare_run(self, backend: Backend, targets, trace: Union[str, None],
+                     cache: Union[ArtifactCache, None], nodes: Set[int] = None) -> _Run:
+        """
+        :param nodes: run only these nodes (instead of targets), dependencies outside of them are considered done
+        """
+        graph = self.compiled_graph
 
-        self.reporter.dag(DagEvent.START, self.dag_name)
+        File.stat_cache.load(backend)
+
+        if nodes is not None:
+            selected = nodes
+        elif targets is None:
+            selected = range(len(graph.labels))
+        else:
+            selected = graph.select(set(_.label() for _ in targets))
+
+        run_with = backend.get_many_run_with(graph.tasks[i].name for i in selected if graph.tasks[i] is not None)
+
+        priority = graph.critical_path(self._task_durations(graph, selected, backend))
+
+        reporter = self.reporter if trace is None else TraceExecutionReporter(self.reporter)
+
+        return _Run(graph, graph.scheduler(selected, priority, nodes is not None), backend, reporter, run_with, cache)
+
+    @staticmethod
+    def _finish_run(run: _Run, trace: Union[str, None]):
+        start = time.time()
+        File.stat_cache.save(run.backend)
+        run.backend.flush()
+        run.reporter.span(SpanEvent.FLUSH, "flush", start, time.time() - start, worker_name())
+
+        if trace is not None:
+            run.reporter.write(trace)
+
+    @staticmethod
+    def _task_durations(graph: CompiledGraph, nodes, backend: Backend) -> Dict[int, float]:
+        """
+        Durations of the last executions of tasks. Never executed tasks get average duration
+        """
+        res = {}
+        unknown = []
+
+        for i in nodes:
+            task = graph.tasks[i]
+            if task is None:
+                continue
+
+            try:
+                res[i] = backend.get_task_stats(task.name)["duration"]
+            except KeyError:
+                unknown.append(i)
+
+        default = sum(res.values()) / len(res) if res else 1.0
+        for i in unknown:
+            res[i] = default
+
+        return res
+
+    @staticmethod
+    def _run_sequential(run: _Run):
+        ts = run.ts
 
         while ts.is_active():
-            nodes = ts.get_ready()
+            for batch in run.batches([_ for _ in ts.get_ready() if run.need_execute(_)]):
+                if len(batch) == 1:
+                    run.executed(batch[0], execute_action(run.graph.tasks[batch[0]].action))
+                    continue
+
+                for node, stats in zip(batch, execute_batch([run.graph.tasks[_].action for _ in batch])):
+                    run.executed(node, stats)
+
+    def _get_worker_pool(self, jobs: int) -> WorkerPool:
+        """
+        Worker pool for a new run
+        """
+        if self._worker_pool is not None and self._worker_pool.processes != jobs:
+            self.close()
 
-            for node in nodes:
-                if node in self.name2task:
-                    task = self.name2task[node]
-                    task.execute(backend)
-                ts.done(node)
+        if self._worker_pool is None:
+            self._worker_pool = WorkerPool(jobs)
 
-        self.reporter.dag(DagEvent.DONE, self.dag_name)
+        self._worker_pool.new_run()
+        return self._worker_pool
 
-        backend.flush()
+    def close(self):
+        """
+        Stop worker processes
+        """
+        if self._worker_pool is not None:
+            self._worker_pool.close()
+            self._worker_pool = None
+
+    @staticmethod
+    def _run_parallel(run: _Run, jobs: int, executor: str, worker_pool: WorkerPool = None):
+        """
+        Up-to-date checks and backend updates are done in the calling thread,
+        only actions are sent to the worker pool. So backends need not to be thread safe.
+        No more than `jobs` actions (or batches of actions) are submitted at once: the rest wait in the priority queue.
+        """
+        if executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=jobs)
+        elif executor == "process":
+            pool = None
+        else:
+            raise ValueError(f"Unknown executor: {executor!r}. Expected 'thread' or 'process'")
+
+        ts = run.ts
+        running = {}  # type: Dict[Any, List[int]]
+        pending = []  # heap of (-priority, first node id, batch)
+
+        try:
+            while ts.is_active():
+                for batch in run.batches([_ for _ in ts.get_ready() if run.need_execute(_)]):
+                    heapq.heappush(pending, (-max(ts.priority[_] for _ in batch), batch[0], batch))
+
+                while pending and len(running) < jobs:
+                    _, _, batch = heapq.heappop(pending)
+                    actions = [run.graph.tasks[_].action for _ in batch]
+
+                    if pool is None:
+                        future = worker_pool.submit(actions, batch=len(batch) > 1)
+                    elif len(batch) == 1:
+                        future = pool.submit(execute_action, actions[0])
+                    else:
+                        future = pool.submit(execute_batch, actions)
+
+                    running[future] = batch
+
+                if not running:
+                    # some nodes were marked as done: ask for newly ready ones
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    batch = running.pop(future)
+                    # re-raises action's exception
+                    res = future.result()
+
+                    # stats of the action or list of stats of the batch
+                    for node, stats in zip(batch, res if isinstance(res, list) else [res]):
+                        run.executed(node, stats)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            else:
+                # kept worker pool: do not leave actions of this run executing
+                wait(running)
+
+    def stats(self, backend: Backend) -> Dict[str, dict]:
+        """
+        Task name -> stats of its last execution (see stats.measure), with durations of previous executions.
+        Never executed tasks are omitted.
+        """
+        res = {}
+
+        for name in self.name2task:
+            try:
+                res[name] = backend.get_task_stats(name)
+            except KeyError:
+                pass
+
+        return res
 
     def to_graphviz(self, targets=None, node2group=None):
         from .graphviz import Renderer
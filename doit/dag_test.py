@@ -1,9 +1,15 @@
+import asyncio
+import json
+import tempfile
+import threading
 import unittest
+from pathlib import Path
 
 from .dag import DAG
-from .backend import DictBackend
-from .artifact import InMemoryArtifact, File
-from .action import delayed
+from .backend import DictBackend, SqliteBackend
+from .artifact import InMemoryArtifact, File, FileGlob
+from .action import delayed, batched
+from .task import AutoUpdate
 from .reporter import ExecutionReporter, DagEvent, TaskEvent
 
 
@@ -96,6 +102,424 @@ class IntegrationTest(unittest.TestCase):
         dag.run(back)
         self.assertEqual(['1', '2', '1', '2'], glval, msg="ignore t1 => second task shouldn't get executed too...")
 
+    def test_fingerprint_memo(self):
+        def foo(target: InMemoryArtifact):
+            target.put_data('foo')
+
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+
+        shared = InMemoryArtifact("memo shared")
+        dag.py_task("Producer", delayed(foo)(shared.tar))
+        for i in range(3):
+            dag.py_task(f"Consumer #{i}", delayed(foo)(InMemoryArtifact(f"memo {i}").tar), depends_on=[shared])
+
+        back = DictBackend(dag.dag_name, None)
+
+        # producer executes on every run, its target is hashed once per run for all the consumers
+        dag.run(back)
+        self.assertEqual(1, shared._fingerprint_calls)
+
+        dag.run(back)
+        self.assertEqual(2, shared._fingerprint_calls)
+        self.assertEqual([TaskEvent.EXECUTE] + [TaskEvent.SKIP] * 3, rep.t[4:])
+
+    def test_early_cutoff(self):
+        data = ["same"]
+        executed = []
+
+        def produce(target: InMemoryArtifact):
+            executed.append("Producer")
+            target.put_data(data[0])
+
+        def consume():
+            executed.append("Consumer")
+
+        dag = DAG("main", reporter=Rep(), early_cutoff=True)
+
+        back = DictBackend(dag.dag_name, None)
+
+        table = InMemoryArtifact("cutoff table")
+        au = AutoUpdate("cutoff au", back)
+        producer = dag.py_task("Producer", delayed(produce)(table.tar), targets=[au])
+        dag.py_task("Consumer", delayed(consume)(), depends_on=[au], depends_on_tasks=[producer])
+
+        dag.run(back)
+        self.assertEqual(["Producer", "Consumer"], executed)
+
+        # producer has no dependencies and is executed again, but its output is the same
+        dag.run(back)
+        self.assertEqual(["Producer", "Consumer", "Producer"], executed)
+
+        data[0] = "changed"
+        dag.run(back)
+        self.assertEqual(["Producer", "Consumer", "Producer", "Producer", "Consumer"], executed)
+
+    def test_action_changed(self):
+        executed = []
+
+        def foo(x, target: InMemoryArtifact):
+            executed.append(x)
+            target.put_data("foo")
+
+        def bar(x, target: InMemoryArtifact):
+            executed.append(x)
+            target.put_data("bar")
+
+        src = InMemoryArtifact("action src")
+        src.put_data("src")
+
+        back = DictBackend("main", None)
+
+        def run(func, x):
+            # DAG is defined anew, as in a new process
+            dag = DAG("main", reporter=Rep())
+            dag.py_task("Task", delayed(func)(x, InMemoryArtifact("action tar").tar), depends_on=[src])
+            dag.run(back)
+
+        run(foo, 1)
+        run(foo, 1)
+        self.assertEqual([1], executed)
+
+        run(foo, 2)
+        self.assertEqual([1, 2], executed)
+
+        run(bar, 2)
+        self.assertEqual([1, 2, 2], executed)
+        run(bar, 2)
+        self.assertEqual([1, 2, 2], executed)
+
+
+class ParallelRunTest(unittest.TestCase):
+    def test_threads(self):
+        # every task waits for all others: passes only if they are executed simultaneously
+        barrier = threading.Barrier(4, timeout=5)
+
+        def foo(target: InMemoryArtifact):
+            barrier.wait()
+            target.put_data(target.label())
+
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+
+        arts = [InMemoryArtifact(f"parallel {i}") for i in range(4)]
+        for i, a in enumerate(arts):
+            dag.py_task(f"Task #{i}", delayed(foo)(a.tar))
+
+        dag.py_task("Sink", delayed(print)(), depends_on=arts)
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back, jobs=4, executor="thread")
+
+        self.assertEqual([TaskEvent.EXECUTE] * 5, rep.t)
+        self.assertEqual("parallel 3", InMemoryArtifact.label2data["parallel 3"])
+
+        # nothing has changed
+        dag.run(back, jobs=4, executor="thread")
+        self.assertEqual([TaskEvent.EXECUTE] * 4 + [TaskEvent.SKIP], rep.t[5:])
+
+    def test_processes(self):
+        def foo(target: File):
+            target.path.write_text(target.path.name)
+
+        with tempfile.TemporaryDirectory() as d:
+            rep = Rep()
+            dag = DAG("main", reporter=rep)
+
+            files = [File(Path(d) / f"{i}.txt") for i in range(3)]
+            for i, f in enumerate(files):
+                dag.py_task(f"Task #{i}", delayed(foo)(f.tar))
+
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+
+            self.assertEqual("2.txt", files[2].path.read_text())
+
+    def test_unknown_executor(self):
+        dag = DAG("main", reporter=Rep())
+        dag.py_task("Task", delayed(print)())
+
+        with self.assertRaises(ValueError):
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="fibers")
+
+    def test_trace(self):
+        a = InMemoryArtifact("trace a")
+
+        dag = DAG("main", reporter=Rep())
+        dag.py_task("A", delayed(InMemoryArtifact.put_data)(a.tar, "a"))
+        dag.py_task("B", delayed(print)(), depends_on=[a])
+
+        with tempfile.TemporaryDirectory() as d:
+            filename = str(Path(d) / "trace.json")
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, trace=filename)
+
+            with open(filename) as fp:
+                events = json.load(fp)["traceEvents"]
+
+        spans = [(_["cat"], _["name"]) for _ in events if _["ph"] == "X"]
+        for cat in ("CHECK", "EXECUTE", "UPDATE"):
+            self.assertIn((cat, "A"), spans)
+            self.assertIn((cat, "B"), spans)
+        self.assertIn(("FLUSH", "flush"), spans)
+
+        execute_a = next(_ for _ in events if _["ph"] == "X" and _["cat"] == "EXECUTE" and _["name"] == "A")
+        self.assertIn(execute_a["tid"], {_["tid"] for _ in events if _["ph"] == "M"})
+
+
+class MapTaskTest(unittest.TestCase):
+    def test_changes_only(self):
+        processed, removed = [], []
+
+        def parse(path: Path, target: InMemoryArtifact):
+            processed.append(path.name)
+            target.put_data(path.name)
+
+        def forget(path: Path, target: InMemoryArtifact):
+            removed.append(path.name)
+
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            (root / "sub").mkdir()
+            for name in ("a.md", "b.md", "sub/c.md", "skip.txt"):
+                (root / name).write_text(name)
+
+            back = DictBackend("main", None)
+
+            def run():
+                # DAG is defined anew, as in a new process
+                dag = DAG("main", reporter=Rep())
+                dag.map_task("Parse", parse, FileGlob(root, "**/*.md"), on_removed=forget,
+                             args=[InMemoryArtifact("map last").tar])
+                dag.run(back)
+
+            run()
+            self.assertEqual(["a.md", "b.md", "c.md"], processed)
+
+            run()
+            self.assertEqual(3, len(processed))
+
+            (root / "a.md").write_text("changed a")
+            (root / "d.md").write_text("d")
+            (root / "sub" / "c.md").unlink()
+            run()
+
+        self.assertEqual(["a.md", "b.md", "c.md", "a.md", "d.md"], processed)
+        self.assertEqual(["c.md"], removed)
+
+    def test_index_is_kept_in_run_backend(self):
+        processed = []
+
+        with tempfile.TemporaryDirectory() as d:
+            for name in ("a.md", "b.md"):
+                (Path(d) / name).write_text(name)
+
+            dag = DAG("main", reporter=Rep())
+            dag.map_task("M", lambda path: processed.append(path.name), FileGlob(d, "*.md"))
+
+            back = DictBackend("main", None)
+            dag.run(back)
+            dag.run(back)
+            self.assertEqual(["a.md", "b.md"], processed)
+
+            # state is lost: everything is processed again
+            dag.run(DictBackend("main", None))
+
+        self.assertEqual(["a.md", "b.md", "a.md", "b.md"], processed)
+
+    def test_file_added_during_execution(self):
+        processed = []
+
+        with tempfile.TemporaryDirectory() as d:
+            def parse(path: Path):
+                processed.append(path.name)
+                (Path(d) / "b.md").write_text("b")
+
+            (Path(d) / "a.md").write_text("a")
+
+            dag = DAG("main", reporter=Rep())
+            dag.map_task("M", parse, FileGlob(d, "*.md"))
+
+            back = DictBackend("main", None)
+            dag.run(back)
+            dag.run(back)
+
+        self.assertEqual(["a.md", "b.md"], processed)
+
+    def test_tasks_over_same_glob(self):
+        processed = []
+
+        with tempfile.TemporaryDirectory() as d:
+            for name in ("a.md", "b.md", "c.md"):
+                (Path(d) / name).write_text(name)
+
+            back = DictBackend("main", None)
+            inputs = FileGlob(d, "*.md")
+
+            dag = DAG("main", reporter=Rep())
+            dag.map_task("Stats", lambda path: processed.append(("Stats", path.name)), inputs)
+            dag.map_task("Convert", lambda path: processed.append(("Convert", path.name)), inputs)
+
+            dag.run(back)
+            dag.run(back)
+
+        self.assertEqual(3, len([_ for _ in processed if _[0] == "Stats"]))
+        self.assertEqual(3, len([_ for _ in processed if _[0] == "Convert"]))
+
+    def test_process_executor(self):
+        def convert(path: Path, out: Path):
+            (out / path.name).write_text(path.read_text().upper())
+
+        with tempfile.TemporaryDirectory() as d:
+            src, out = Path(d) / "src", Path(d) / "out"
+            src.mkdir()
+            out.mkdir()
+            for name in ("a.md", "b.md"):
+                (src / name).write_text(name)
+
+            back = SqliteBackend("main", None)
+
+            dag = DAG("main", reporter=Rep())
+            dag.map_task("Convert", convert, FileGlob(src, "*.md"), args=[out])
+            dag.py_task("Other", delayed(print)())
+
+            try:
+                dag.run(back, jobs=2, executor="process")
+                self.assertEqual("A.MD", (out / "a.md").read_text())
+
+                (out / "b.md").unlink()
+                (src / "a.md").write_text("changed")
+                dag.run(back, jobs=2, executor="process")
+            finally:
+                dag.close()
+
+            self.assertEqual("CHANGED", (out / "a.md").read_text())
+            # unchanged input is not processed again
+            self.assertFalse((out / "b.md").exists())
+
+
+
+class BatchTest(unittest.TestCase):
+    def check(self, **run_kwargs):
+        calls = []
+
+        def parse(batch):
+            calls.append(len(batch))
+            for text, target in batch:
+                target.put_data(text.upper())
+
+        dag = DAG("main", reporter=Rep())
+
+        arts = [InMemoryArtifact(f"batch {i}") for i in range(5)]
+        for i, a in enumerate(arts):
+            dag.py_task(f"Parse #{i}", batched(parse, batch_size=2)(f"text {i}", a.tar))
+        dag.py_task("Sink", delayed(print)(), depends_on=arts)
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back, **run_kwargs)
+
+        # batches may be executed in any order by threads
+        self.assertEqual([1, 2, 2], sorted(calls))
+        self.assertEqual("TEXT 4", InMemoryArtifact.label2data["batch 4"])
+
+        # every task is recorded
+        self.assertEqual(6, len(dag.stats(back)))
+        dag.run(back, **run_kwargs)
+        self.assertEqual([1, 1, 2, 2, 2, 2], sorted(calls))
+
+    def test_sequential(self):
+        self.check()
+
+    def test_threads(self):
+        self.check(jobs=2)
+
+
+
+class PriorityTest(unittest.TestCase):
+    def test_insertion_order(self):
+        order = []
+
+        dag = DAG("main", reporter=Rep())
+        for name in "ABCDEF":
+            dag.py_task(name, delayed(order.append)(name))
+
+        dag.run(DictBackend(dag.dag_name, None))
+
+        # independent tasks of the same priority are executed in the order they were added
+        self.assertEqual(list("ABCDEF"), order)
+        self.assertEqual(list("ABCDEF"), dag.compiled_graph.labels)
+
+    def test_critical_path_order(self):
+        order = []
+
+        def foo(name, target: InMemoryArtifact):
+            order.append(name)
+            target.put_data(name)
+
+        dag = DAG("main", reporter=Rep())
+
+        long_a = InMemoryArtifact("priority long")
+        for i in range(3):
+            dag.py_task(f"Short #{i}", delayed(foo)(f"Short #{i}", InMemoryArtifact(f"priority short {i}").tar))
+        dag.py_task("Long", delayed(foo)("Long", long_a.tar))
+        dag.py_task("After long", delayed(foo)("After long", InMemoryArtifact("priority after").tar),
+                    depends_on=[long_a])
+
+        back = DictBackend(dag.dag_name, None)
+        for name in ("Short #0", "Short #1", "Short #2", "After long"):
+            back.set_task_stats(name, {"duration": 1.0})
+        back.set_task_stats("Long", {"duration": 0.5})
+
+        graph = dag.compiled_graph
+        weights = dag._task_durations(graph, range(len(graph.labels)), back)
+        cp = graph.critical_path(weights)
+        self.assertEqual(1.5, cp[graph.label2id["Long"]])
+        self.assertEqual(1.0, cp[graph.label2id["Short #1"]])
+
+        # task on the longest path is started first
+        dag.run(back)
+        self.assertEqual("Long", order[0])
+
+        # durations are recorded
+        self.assertLess(back.get_task_stats("Long")["duration"], 0.5)
+        self.assertEqual(1, len(back.get_task_stats("Long")["history"]))
+        self.assertEqual({"Short #0", "Short #1", "Short #2", "Long", "After long"}, set(dag.stats(back)))
+        self.assertIn("cpu_time", dag.stats(back)["Long"])
+
+        # "After long" is up-to-date: "Long" produced the same data
+        dag.run(back, jobs=2)
+        self.assertEqual(set(order[:4]), set(order[5:]))
+
+
+class AsyncRunTest(unittest.TestCase):
+    def test_limits(self):
+        active = {"db": 0, "http": 0}
+        max_active = {"db": 0, "http": 0}
+
+        async def query(group, target: InMemoryArtifact):
+            active[group] += 1
+            max_active[group] = max(max_active[group], active[group])
+            await asyncio.sleep(0.01)
+            active[group] -= 1
+            target.put_data(group)
+
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+
+        for group in ("db", "http"):
+            for i in range(4):
+                dag.py_task(f"{group} #{i}", delayed(query)(group, InMemoryArtifact(f"async {group} {i}").tar),
+                            resource=group)
+        dag.py_task("Sync", delayed(print)(), depends_on=[InMemoryArtifact("async db 0")])
+
+        back = DictBackend(dag.dag_name, None)
+        asyncio.run(dag.async_run(back, limits={"db": 2}))
+
+        self.assertEqual(2, max_active["db"])
+        self.assertEqual(4, max_active["http"])
+        self.assertEqual([TaskEvent.EXECUTE] * 9, rep.t)
+
+        asyncio.run(dag.async_run(back, limits={"db": 2}))
+        self.assertEqual([TaskEvent.EXECUTE] * 8 + [TaskEvent.SKIP], rep.t[9:])
+
 
 class DagTest(unittest.TestCase):
     def test_check_labels(self):
@@ -108,6 +532,43 @@ class DagTest(unittest.TestCase):
         with self.assertRaises(Exception) as context:
             dag.check_labels()
 
+    def test_compiled_graph(self):
+        rep = Rep()
+        dag = DAG("main", reporter=rep)
+
+        a, b, c = InMemoryArtifact("compiled a"), InMemoryArtifact("compiled b"), InMemoryArtifact("compiled c")
+        dag.py_task("A", delayed(InMemoryArtifact.put_data)(a.tar, "a"))
+        dag.py_task("B", delayed(InMemoryArtifact.put_data)(b.tar, "b"), depends_on=[a])
+
+        graph = dag.compiled_graph
+        self.assertIs(graph, dag.compiled_graph)
+
+        self.assertEqual({"A", "B", a.label(), b.label()}, set(graph.labels))
+        self.assertEqual([graph.label2id[a.label()]], graph.dependencies[graph.label2id["B"]])
+        self.assertEqual({graph.label2id[_] for _ in ("A", a.label())}, graph.select({a.label()}))
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back, targets=[a])
+        self.assertEqual([TaskEvent.EXECUTE], rep.t)
+
+        dag.py_task("C", delayed(InMemoryArtifact.put_data)(c.tar, "c"), depends_on=[b])
+        self.assertIsNot(graph, dag.compiled_graph)
+
+        dag.run(back, targets=[c])
+        self.assertEqual([TaskEvent.EXECUTE, TaskEvent.EXECUTE, TaskEvent.EXECUTE, TaskEvent.EXECUTE], rep.t)
+
+    def test_cycle(self):
+        from graphlib import CycleError
+
+        a, b = InMemoryArtifact("cycle a"), InMemoryArtifact("cycle b")
+
+        dag = DAG("main")
+        dag.py_task("A", delayed(print)(), targets=[a], depends_on=[b])
+        dag.py_task("B", delayed(print)(), targets=[b], depends_on=[a])
+
+        with self.assertRaises(CycleError):
+            dag.run(DictBackend(dag.dag_name, None))
+
     def test__get_subgraph(self):
         from .dag import _get_subgraph
 
@@ -131,6 +592,25 @@ class DagTest(unittest.TestCase):
             _get_subgraph({'a': ['b', 'c'], 'b': ['c', 'd']}, {'x'})
         )
 
+    def test_subgraph_diamond(self):
+        from .dag import DepGraph
+
+        graph = DepGraph({'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': ['e']}, {})
+        sub = graph.subgraph({'a'})
+
+        self.assertEqual({'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': ['e']}, sub.dep_graph)
+        self.assertIs(graph.label2node, sub.label2node)
+        self.assertEqual({'c', 'd', 'e'}, graph.subgraph({'c'}).all_nodes())
+
+    def test_select_cache(self):
+        dag = DAG("main")
+        a = InMemoryArtifact("select a")
+        dag.py_task("A", delayed(print)(), targets=[a])
+
+        graph = dag.compiled_graph
+        self.assertIs(graph.select({a.label()}), graph.select({a.label()}))
+        self.assertEqual(frozenset(), graph.select({"unknown"}))
+
     def test__all_nodes(self):
         from .dag import _all_nodes
 
@@ -10,6 +10,8 @@ from dbm import dumb
 import dbm as ddbm
 
 from .task import Task
+from . import hashing
+from . import stats
 
 # uncomment imports below to run tests on all dbm backends...
 # import dumbdbm as ddbm
@@ -38,19 +40,16 @@ def get_file_md5(path):
     @param path: (string) file path
     @return: (string) md5
     """
-    with open(path, 'rb') as file_data:
-        md5 = hashlib.md5()
-        block_size = 128 * md5.block_size
-        while True:
-            data = file_data.read(block_size)
-            if not data:
-                break
-            md5.update(data)
-    return md5.hexdigest()
+    return hashing.hash_file(path, 'md5')
 
 
 class JSONCodec():
-    """default implementation for codec used to save individual task's data"""
+    """default implementation for codec used to save individual task's data
+
+    Codecs with ``binary = True`` (see doit.codec.BinaryCodec) encode to bytes.
+    """
+    binary = False
+
     def __init__(self):
         self.encoder = json.JSONEncoder()
         self.decoder = json.JSONDecoder()
@@ -77,7 +76,7 @@ class JsonDB(object):
 
     def _load(self):
         """load db content from file"""
-        db_file = open(self.name, 'r')
+        db_file = open(self.name, 'rb' if getattr(self.codec, 'binary', False) else 'r')
         try:
             try:
                 return self.codec.decode(db_file.read())
@@ -95,7 +94,7 @@ class JsonDB(object):
     def dump(self):
         """save DB content in file"""
         try:
-            db_file = open(self.name, 'w')
+            db_file = open(self.name, 'wb' if getattr(self.codec, 'binary', False) else 'w')
             db_file.write(self.codec.encode(self._db))
         finally:
             db_file.close()
@@ -212,7 +211,9 @@ class DbmDB(object):
                 task_data = self._dbm[task_id]
             except KeyError:
                 return
-            self._db[task_id] = self.codec.decode(task_data.decode('utf-8'))
+            if not getattr(self.codec, 'binary', False):
+                task_data = task_data.decode('utf-8')
+            self._db[task_id] = self.codec.decode(task_data)
             return self._db[task_id].get(dependency, None)
 
 
@@ -268,7 +269,9 @@ class SqliteDB(object):
                 data[col[0]] = row[idx]
             return data
         def converter(data):
-            return self.codec.decode(data.decode('utf-8'))
+            if not getattr(self.codec, 'binary', False):
+                data = data.decode('utf-8')
+            return self.codec.decode(data)
 
         sqlite3.register_adapter(list, self.codec.encode)
         sqlite3.register_adapter(dict, self.codec.encode)
@@ -492,6 +495,7 @@ class Dependency(object):
 
     * ``_values_:`` task's values
     * ``result:`` task result
+    * ``stats:`` execution stats (see doit.stats.measure)
 
     And also some internal doit attributes:
 
@@ -553,6 +557,19 @@ class Dependency(object):
         # save list of file_deps
         self._set(task.name, 'deps:', tuple(task.file_dep))
 
+        # save execution stats, with durations of previous executions
+        task_stats = getattr(task, 'stats', None)
+        if task_stats:
+            self._set(task.name, 'stats:',
+                      stats.with_history(task_stats, self.get_stats(task.name)))
+
+    def get_stats(self, task_name):
+        """get execution stats saved from a task
+
+        :return dict: or None if task was never executed
+        """
+        return self._get(task_name, 'stats:')
+
     def get_values(self, task_name):
         """get all saved values from a task
 
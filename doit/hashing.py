@@ -0,0 +1,100 @@
+"""Hash engines used to fingerprint artifacts"""
+import hashlib
+import mmap
+import os
+
+DEFAULT_ALGORITHM = "md5"
+
+# files are read with readinto() into a preallocated buffer of this size
+BUFFER_SIZE = 1 << 20
+# larger files are mapped into memory and hashed with a single update() call
+MMAP_THRESHOLD = 64 << 20
+
+ALGORITHMS = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+}
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover
+    pass
+else:
+    ALGORITHMS["xxh64"] = xxhash.xxh64
+    ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+
+try:
+    import blake3
+except ImportError:  # pragma: no cover
+    pass
+else:
+    ALGORITHMS["blake3"] = blake3.blake3
+
+_algorithm = DEFAULT_ALGORITHM
+
+
+def set_algorithm(name: str) -> None:
+    """
+    Select algorithm used for all new fingerprints.
+    Fingerprints made with another algorithm never compare equal, so changing it invalidates old ones.
+    """
+    global _algorithm
+
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {name!r}. Available: {sorted(ALGORITHMS)}")
+
+    _algorithm = name
+
+
+def get_algorithm() -> str:
+    return _algorithm
+
+
+def new_hasher(algorithm: str = None):
+    return ALGORITHMS[algorithm or _algorithm]()
+
+
+def _format(algorithm: str, hexdigest: str) -> str:
+    """
+    Prefix digest with the algorithm name, so it is stored in backends together with the digest.
+    md5 digests are kept bare to stay compatible with fingerprints saved by previous versions.
+    """
+    if algorithm == "md5":
+        return hexdigest
+
+    return f"{algorithm}:{hexdigest}"
+
+
+def hash_bytes(data, algorithm: str = None) -> str:
+    """
+    :param data: bytes or any object supporting buffer protocol
+    """
+    algorithm = algorithm or _algorithm
+
+    h = new_hasher(algorithm)
+    h.update(data)
+
+    return _format(algorithm, h.hexdigest())
+
+
+def hash_file(path, algorithm: str = None) -> str:
+    algorithm = algorithm or _algorithm
+
+    h = new_hasher(algorithm)
+
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            buf = bytearray(min(BUFFER_SIZE, size + 1))
+            view = memoryview(buf)
+
+            while n := f.readinto(buf):
+                h.update(view[:n])
+
+    return _format(algorithm, h.hexdigest())
@@ -0,0 +1,50 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from . import hashing
+
+
+class HashingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "a.bin"
+        self.data = bytes(range(256)) * 5000
+        self.path.write_bytes(self.data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        hashing.set_algorithm(hashing.DEFAULT_ALGORITHM)
+
+    def test_md5_is_bare(self):
+        self.assertEqual(hashlib.md5(self.data).hexdigest(), hashing.hash_file(self.path))
+        self.assertEqual(hashlib.md5(b"abc").hexdigest(), hashing.hash_bytes(b"abc"))
+
+    def test_algorithm_prefix(self):
+        hashing.set_algorithm("blake2b")
+
+        self.assertEqual("blake2b:" + hashlib.blake2b(self.data).hexdigest(), hashing.hash_file(self.path))
+        self.assertNotEqual(hashing.hash_bytes(b"abc", "md5"), hashing.hash_bytes(b"abc"))
+
+    def test_read_modes(self):
+        expected = hashing.hash_file(self.path, "sha256")
+
+        with mock.patch.object(hashing, "BUFFER_SIZE", 1000):
+            self.assertEqual(expected, hashing.hash_file(self.path, "sha256"))
+
+        with mock.patch.object(hashing, "MMAP_THRESHOLD", 1):
+            self.assertEqual(expected, hashing.hash_file(self.path, "sha256"))
+
+    def test_empty_file(self):
+        self.path.write_bytes(b"")
+        self.assertEqual(hashlib.md5(b"").hexdigest(), hashing.hash_file(self.path))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            hashing.set_algorithm("crc0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,6 @@
+import collections
+import json
+import time
 from enum import Enum
 from typing import Set
 
@@ -6,6 +9,7 @@ class TaskEvent(Enum):
     SKIP = 1
     IGNORE = 2
     EXECUTE = 3
+    RESTORE = 4  # targets are restored from cache.ArtifactCache
 
 
 class DagEvent(Enum):
@@ -13,6 +17,14 @@ class DagEvent(Enum):
     DONE = 2
 
 
+class SpanEvent(Enum):
+    CHECK = 1  # Task.need_execute
+    EXECUTE = 2  # action execution
+    FINGERPRINT = 3  # artifact hashing
+    UPDATE = 4  # Task.update_fingerprints_in_backend
+    FLUSH = 5  # Backend.flush
+
+
 class ExecutionReporter:
     # ------------------------------------------------------------------------------------------------------------------
     def filter_events(self, keep_task_events=()):
@@ -20,6 +32,13 @@ class ExecutionReporter:
             self, keep_task_events=keep_task_events
         )
 
+    # ------------------------------------------------------------------------------------------------------------------
+    def accepts(self, event: TaskEvent) -> bool:
+        """
+        False if task events of this type are dropped: callers may skip formatting of the reason
+        """
+        return True
+
     # ------------------------------------------------------------------------------------------------------------------
     def task(self, event: TaskEvent, task_name: str, reason: str):
         raise NotImplementedError()
@@ -28,12 +47,26 @@ class ExecutionReporter:
     def dag(self, event: DagEvent, dag_name: str):
         raise NotImplementedError()
 
+    # ------------------------------------------------------------------------------------------------------------------
+    def span(self, event: SpanEvent, name: str, start: float, duration: float, worker: str):
+        """
+        Timing of a step of the run. Ignored by default.
+
+        :param start: unix time
+        :param duration: seconds
+        :param worker: process/thread which did the work
+        """
+        pass
+
 
 class FilteredExecutionReporter(ExecutionReporter):
     def __init__(self, rep: ExecutionReporter, keep_task_events):
         self.rep = rep
         self.keep_task_events = keep_task_events
 
+    def accepts(self, event: TaskEvent) -> bool:
+        return event in self.keep_task_events and self.rep.accepts(event)
+
     def task(self, event: TaskEvent, task_name: str, reason: str):
         if event in self.keep_task_events:
             self.rep.task(event, task_name, reason)
@@ -41,26 +74,163 @@ class FilteredExecutionReporter(ExecutionReporter):
     def dag(self, event: DagEvent, dag_name: str):
         self.rep.dag(event, dag_name)
 
+    def span(self, event: SpanEvent, name: str, start: float, duration: float, worker: str):
+        self.rep.span(event, name, start, duration, worker)
+
+
+class TraceExecutionReporter(ExecutionReporter):
+    """
+    Collects timings of the run and saves them in Trace Event Format (chrome://tracing, ui.perfetto.dev).
+    All events are passed to the wrapped reporter too.
+    """
+
+    def __init__(self, rep: ExecutionReporter):
+        self.rep = rep
+        self.events = []
+        self.worker2tid = {}
+
+    def _tid(self, worker: str) -> int:
+        try:
+            return self.worker2tid[worker]
+        except KeyError:
+            tid = self.worker2tid[worker] = len(self.worker2tid) + 1
+            return tid
+
+    def accepts(self, event: TaskEvent) -> bool:
+        return self.rep.accepts(event)
+
+    def task(self, event: TaskEvent, task_name: str, reason: str):
+        self.rep.task(event, task_name, reason)
+
+    def dag(self, event: DagEvent, dag_name: str):
+        self.rep.dag(event, dag_name)
+
+    def span(self, event: SpanEvent, name: str, start: float, duration: float, worker: str):
+        self.rep.span(event, name, start, duration, worker)
+
+        self.events.append({
+            "name": name,
+            "cat": event.name,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": duration * 1e6,
+            "pid": 1,
+            "tid": self._tid(worker),
+        })
+
+    def trace(self) -> dict:
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": worker}}
+            for worker, tid in self.worker2tid.items()
+        ]
+
+        return {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}
+
+    def write(self, filename: str):
+        with open(filename, encoding='utf-8', mode='w') as fp:
+            json.dump(self.trace(), fp, ensure_ascii=False)
+
+
+class BufferedExecutionReporter(ExecutionReporter):
+    """
+    Keeps events as tuples (unix time, kind, event name, task or dag name, reason) without any formatting.
+
+    Without filename only the last `buffer_size` events are kept in `events` (ring buffer).
+    With filename events are appended to it as JSON lines in batches of `buffer_size`
+    and when the run is done.
+
+    :param task_events: task events to keep, others are dropped
+    """
+
+    def __init__(self, filename: str = None, buffer_size=10000, task_events=tuple(TaskEvent)):
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.task_events = frozenset(task_events)
+        self.events = collections.deque(maxlen=buffer_size if filename is None else None)
+
+    def accepts(self, event: TaskEvent) -> bool:
+        return event in self.task_events
+
+    def task(self, event: TaskEvent, task_name: str, reason: str):
+        if event in self.task_events:
+            self.events.append((time.time(), "task", event.name, task_name, reason))
+
+            if self.filename is not None and len(self.events) >= self.buffer_size:
+                self.flush()
+
+    def dag(self, event: DagEvent, dag_name: str):
+        self.events.append((time.time(), "dag", event.name, dag_name, None))
+
+        if self.filename is not None and event == DagEvent.DONE:
+            self.flush()
+
+    def flush(self):
+        """
+        Append buffered events to the file
+        """
+        if self.filename is None or not self.events:
+            return
+
+        keys = ("time", "kind", "event", "name", "reason")
+        lines = [json.dumps(dict(zip(keys, e)), ensure_ascii=False) + "\n" for e in self.events]
+
+        with open(self.filename, encoding='utf-8', mode='a') as fp:
+            fp.writelines(lines)
+
+        self.events.clear()
+
 
 class LogExecutionReporter(ExecutionReporter):
-    def __init__(self, logger=None):
+    """
+    Task events are logged at INFO level. Loguru formats messages only if they are emitted,
+    messages for other loggers (e.g. logging.Logger) are formatted here.
+
+    :param task_events: task events to log, e.g. (TaskEvent.EXECUTE, ) to keep up-to-date runs quiet and cheap
+    """
+    LEVEL_NO = 20  # INFO
+
+    def __init__(self, logger=None, task_events=tuple(TaskEvent)):
         if logger is None:
             import loguru
             self.logger = loguru.logger
         else:
             self.logger = logger
 
+        self.task_events = frozenset(task_events)
+        self._loguru = hasattr(self.logger, "_core")
+
         super(LogExecutionReporter, self).__init__()
 
     def _copy(self):
-        res = LogExecutionReporter(self.logger)
+        res = LogExecutionReporter(self.logger, self.task_events)
         return res
 
+    def _info_enabled(self) -> bool:
+        """
+        False if INFO records are dropped by the logger. Loguru has no public API for it: its core is checked,
+        other loggers are asked with isEnabledFor (logging.Logger) or assumed to be enabled
+        """
+        if self._loguru:
+            return getattr(self.logger._core, "min_level", 0) <= self.LEVEL_NO
+
+        is_enabled_for = getattr(self.logger, "isEnabledFor", None)
+        return is_enabled_for is None or is_enabled_for(self.LEVEL_NO)
+
+    def accepts(self, event: TaskEvent) -> bool:
+        return event in self.task_events and self._info_enabled()
+
     def task(self, event: TaskEvent, task_name: str, reason: str):
-        self.logger.info(
-            f"{event.name: >7}: {task_name}: {reason}"
-        )
+        if event not in self.task_events:
+            return
+
+        self._info("{: >7}: {}: {}", event.name, task_name, reason)
 
     def dag(self, event: DagEvent, dag_name: str):
-        self.logger.info(f"{event.name: >5}: {dag_name}")
+        self._info("{: >5}: {}", event.name, dag_name)
+
+    def _info(self, message: str, *args):
+        if self._loguru:
+            self.logger.info(message, *args)
+        else:
+            self.logger.info(message.format(*args))
 
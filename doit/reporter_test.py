@@ -0,0 +1,102 @@
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from .dag import DAG
+from .backend import DictBackend
+from .artifact import InMemoryArtifact
+from .action import delayed
+from .reporter import BufferedExecutionReporter, DagEvent, LogExecutionReporter, TaskEvent
+
+
+class BufferedReporterTest(unittest.TestCase):
+    def test_ring_buffer(self):
+        rep = BufferedExecutionReporter(buffer_size=3)
+
+        for i in range(5):
+            rep.task(TaskEvent.SKIP, f"Task #{i}", "it is up-to-date")
+
+        self.assertEqual(["Task #2", "Task #3", "Task #4"], [_[3] for _ in rep.events])
+
+    def test_task_events(self):
+        a = InMemoryArtifact("buffered a")
+
+        rep = BufferedExecutionReporter(task_events=(TaskEvent.EXECUTE, ))
+        dag = DAG("main", reporter=rep)
+        dag.py_task("A", delayed(InMemoryArtifact.put_data)(a.tar, "a"))
+        dag.py_task("B", delayed(print)(), depends_on=[a])
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back)
+        dag.run(back)
+
+        # B is up-to-date on the second run
+        self.assertFalse(rep.accepts(TaskEvent.SKIP))
+        self.assertEqual(
+            [("dag", "START"), ("task", "EXECUTE"), ("task", "EXECUTE"), ("dag", "DONE"),
+             ("dag", "START"), ("task", "EXECUTE"), ("dag", "DONE")],
+            [(_[1], _[2]) for _ in rep.events]
+        )
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = str(Path(d) / "events.jsonl")
+            rep = BufferedExecutionReporter(filename, buffer_size=2)
+
+            rep.dag(DagEvent.START, "main")
+            rep.task(TaskEvent.EXECUTE, "A", "it has no dependencies")
+            self.assertEqual(2, len(Path(filename).read_text().splitlines()))
+
+            rep.task(TaskEvent.SKIP, "B", "it is up-to-date")
+            self.assertEqual(2, len(Path(filename).read_text().splitlines()))
+
+            rep.dag(DagEvent.DONE, "main")
+
+            with open(filename) as fp:
+                events = [json.loads(line) for line in fp]
+
+        self.assertEqual(["START", "EXECUTE", "SKIP", "DONE"], [_["event"] for _ in events])
+        self.assertEqual("it is up-to-date", events[2]["reason"])
+        self.assertEqual(0, len(rep.events))
+
+
+class CountingArtifact(InMemoryArtifact):
+    str_calls = 0
+
+    def __str__(self):
+        CountingArtifact.str_calls += 1
+        return super().__str__()
+
+
+class LogReporterTest(unittest.TestCase):
+    def test_logger_level(self):
+        logger = logging.getLogger("doit.reporter_test")
+        rep = LogExecutionReporter(logger)
+
+        logger.setLevel(logging.WARNING)
+        self.assertFalse(rep.accepts(TaskEvent.EXECUTE))
+
+        logger.setLevel(logging.INFO)
+        self.assertTrue(rep.accepts(TaskEvent.EXECUTE))
+
+        with self.assertLogs(logger, logging.INFO) as logs:
+            rep.task(TaskEvent.EXECUTE, "A", "it has no dependencies")
+        self.assertEqual(["EXECUTE: A: it has no dependencies"], [_.getMessage().strip() for _ in logs.records])
+
+    def test_reason_is_not_formatted(self):
+        a = CountingArtifact("lazy reason")
+        a.put_data("a")
+
+        logger = logging.getLogger("doit.reporter_test.lazy")
+        logger.setLevel(logging.WARNING)
+
+        dag = DAG("main", reporter=LogExecutionReporter(logger))
+        dag.py_task("A", delayed(print)(), depends_on=[a])
+
+        back = DictBackend(dag.dag_name, None)
+        dag.run(back)
+        dag.run(back)
+
+        self.assertEqual(0, CountingArtifact.str_calls)
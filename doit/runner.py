@@ -15,6 +15,7 @@ from .task import Task
 from .backend import Backend
 
 from .dependency import Dependency
+from . import stats
 
 # execution result.
 SUCCESS = 0
@@ -167,7 +168,9 @@ class Runner:
         if task.teardown:
             self.teardown_list.append(task)
 
-        return task.execute()
+        # saved by dep_manager.save_success()
+        failure, task.stats = stats.measure(task.execute)
+        return failure
 
     def process_task_result(self, node, base_fail):
         """handles result"""
@@ -214,9 +217,10 @@ class Runner:
                 self.dep_manager.save_success(node.task)
                 node.run_status = "successful"
 
-                loguru.logger.info(f"Successfully executed {node.task.name}")
+                # formatted by loguru only if info level is enabled
+                loguru.logger.info("Successfully executed {}", node.task.name)
             except Exception:
-                loguru.logger.exception(f"Failure in {node.task.name}")
+                loguru.logger.exception("Failure in {}", node.task.name)
 
                 node.run_status = "failure"
                 self.dep_manager.remove_success(node.task)
@@ -435,6 +439,7 @@ class MRunner(Runner):
         """process result received from sub-process"""
         base_fail = result.get('failure')
         task.update_from_pickle(result['task'])
+        task.stats = result.get('stats')
         for action, output in zip(task.actions, result['out']):
             action.out = output
         for action, output in zip(task.actions, result['err']):
@@ -538,6 +543,7 @@ class MRunner(Runner):
                 if task_failure:
                     result['failure'] = task_failure
                 result['task'] = task.pickle_safe_dict()
+                result['stats'] = task.stats
                 result['out'] = [action.out for action in task.actions]
                 result['err'] = [action.err for action in task.actions]
 
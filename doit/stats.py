@@ -0,0 +1,105 @@
+"""Execution stats of actions: wall/CPU time, memory and I/O"""
+import os
+import sys
+import threading
+import time
+from typing import Callable, Tuple, Any
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# number of previous durations kept to spot slowly regressing tasks
+HISTORY_SIZE = 10
+
+
+def _io_counters() -> Tuple[int, int]:
+    """
+    Bytes read and written by the current thread (Linux only), (0, 0) if not available
+    """
+    read = written = 0
+
+    try:
+        with open("/proc/thread-self/io", "rb") as f:
+            for line in f:
+                if line.startswith(b"rchar:"):
+                    read = int(line[6:])
+                elif line.startswith(b"wchar:"):
+                    written = int(line[6:])
+    except OSError:
+        pass
+
+    return read, written
+
+
+def _children_cpu_time() -> float:
+    if resource is None:
+        return 0.0
+
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _max_rss() -> int:
+    """
+    Peak resident set size of the current process in bytes, 0 if not available
+    """
+    if resource is None:
+        return 0
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def worker_name() -> str:
+    return f"{os.getpid()}/{threading.current_thread().name}"
+
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, dict]:
+    """
+    Call func, returns its result and execution stats:
+
+    - duration: wall time, seconds
+    - cpu_time: CPU time of the calling thread and of finished child processes, seconds
+    - max_rss: peak RSS of the whole process after the call, bytes
+    - read_bytes, write_bytes: I/O done by the calling thread (Linux only)
+    - started: unix time of the call
+    - worker: process id and name of the thread which made the call
+    """
+    read0, written0 = _io_counters()
+    children0 = _children_cpu_time()
+    cpu0 = time.thread_time()
+    started = time.time()
+    start = time.perf_counter()
+
+    res = func()
+
+    duration = time.perf_counter() - start
+    cpu = time.thread_time() - cpu0 + _children_cpu_time() - children0
+    read1, written1 = _io_counters()
+
+    return res, {
+        "duration": duration,
+        "cpu_time": cpu,
+        "max_rss": _max_rss(),
+        "read_bytes": read1 - read0,
+        "write_bytes": written1 - written0,
+        "started": started,
+        "worker": worker_name(),
+    }
+
+
+def with_history(stats: dict, prev: dict = None) -> dict:
+    """
+    Add durations of previous executions (latest last) and executions counter.
+    Timeline fields (started, worker) are not kept.
+    """
+    prev = prev or {}
+
+    res = {k: v for k, v in stats.items() if k not in ("started", "worker")}
+    res["history"] = (prev.get("history", []) + [stats["duration"]])[-HISTORY_SIZE:]
+    res["runs"] = prev.get("runs", 0) + 1
+
+    return res
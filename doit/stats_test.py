@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+from . import stats
+
+
+class StatsTest(unittest.TestCase):
+    def test_measure(self):
+        with tempfile.TemporaryDirectory() as d:
+            def foo():
+                with open(os.path.join(d, "a.bin"), "wb") as f:
+                    f.write(b"x" * 100000)
+                return sum(range(100000))
+
+            res, st = stats.measure(foo)
+
+        self.assertEqual(sum(range(100000)), res)
+        self.assertGreater(st["duration"], 0)
+        self.assertGreater(st["cpu_time"], 0)
+        self.assertGreaterEqual(st["max_rss"], 0)
+        if os.path.exists("/proc/thread-self/io"):
+            self.assertGreaterEqual(st["write_bytes"], 100000)
+
+    def test_history(self):
+        st = None
+        for i in range(stats.HISTORY_SIZE + 2):
+            st = stats.with_history({"duration": float(i)}, st)
+
+        self.assertEqual(stats.HISTORY_SIZE + 2, st["runs"])
+        self.assertEqual(float(stats.HISTORY_SIZE + 1), st["history"][-1])
+        self.assertEqual(stats.HISTORY_SIZE, len(st["history"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+"""Stores of InMemoryArtifact data"""
+import collections
+import hashlib
+import os
+import pathlib
+import pickle
+import sys
+import tempfile
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict
+
+from . import hashing
+
+
+def _buffer(value):
+    """
+    Bytes to hash: objects supporting buffer protocol (bytes, memoryview, NumPy arrays, Arrow buffers)
+    are used without copying, if they are contiguous
+    """
+    if isinstance(value, str):
+        return value.encode('utf-8')
+
+    try:
+        view = memoryview(value)
+    except TypeError:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return view if view.c_contiguous else view.tobytes()
+
+
+def value_fingerprint(value) -> str:
+    return hashing.hash_bytes(_buffer(value))
+
+
+def _size(value) -> int:
+    if isinstance(value, str):
+        return len(value)
+
+    try:
+        return memoryview(value).nbytes
+    except TypeError:
+        return sys.getsizeof(value)
+
+
+def dump_value(value, fp) -> None:
+    """
+    Write value into binary file: str and bytes-like values as is, others pickled
+    """
+    if isinstance(value, str):
+        fp.write(b"s")
+        fp.write(value.encode('utf-8'))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        fp.write(b"b")
+        fp.write(_buffer(value))
+    else:
+        fp.write(b"p")
+        pickle.dump(value, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_value(fp):
+    """
+    Read value written by dump_value. bytearray and memoryview values are loaded as bytes
+    """
+    kind = fp.read(1)
+
+    if kind == b"s":
+        return fp.read().decode('utf-8')
+    if kind == b"b":
+        return fp.read()
+    if kind == b"p":
+        return pickle.load(fp)
+
+    raise ValueError(f"Unknown value kind {kind!r}")
+
+
+class ArtifactStore(MutableMapping):
+    """
+    Label -> data of InMemoryArtifact's, kept in memory without limits.
+    Fingerprints of values are computed once per value: mutable values (bytearray, NumPy arrays)
+    must not be modified after they are put into the store.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: Dict[str, Any]
+        self._fingerprints = {}  # type: Dict[str, str]
+
+    def fingerprint(self, key: str) -> str:
+        try:
+            return self._fingerprints[key]
+        except KeyError:
+            pass
+
+        fp = self._fingerprints[key] = value_fingerprint(self[key])
+        return fp
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._fingerprints.pop(key, None)
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._fingerprints.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SpillingStore(ArtifactStore):
+    """
+    Keeps at most `memory_limit` bytes (length of str, size of buffers, sys.getsizeof of other values) in memory.
+    Least recently used values are saved into files in `directory` (temporary one by default, see dump_value)
+    and loaded back on access. The most recent value stays in memory even if it alone exceeds the limit.
+
+    Membership checks and fingerprints of spilled values do not load them.
+    """
+
+    def __init__(self, memory_limit: int, directory=None):
+        super().__init__()
+
+        self.memory_limit = memory_limit
+
+        if directory is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="doit-store-")
+            directory = self._tmp.name
+
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._data = collections.OrderedDict()  # in memory values, least recently used first
+        self._sizes = {}  # type: Dict[str, int]
+        self._memory_size = 0
+        self._spilled = {}  # type: Dict[str, pathlib.Path]
+
+        self._lock = threading.RLock()  # actions executed in threads put data simultaneously
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _drop(self, key: str):
+        if key in self._data:
+            del self._data[key]
+            self._memory_size -= self._sizes.pop(key)
+        elif key in self._spilled:
+            os.remove(self._spilled.pop(key))
+        else:
+            raise KeyError(key)
+
+    def _put(self, key: str, value):
+        self._data[key] = value
+        self._sizes[key] = _size(value)
+        self._memory_size += self._sizes[key]
+
+        while self._memory_size > self.memory_limit and len(self._data) > 1:
+            old_key, old_value = self._data.popitem(last=False)
+            self._memory_size -= self._sizes.pop(old_key)
+
+            if old_key not in self._fingerprints:
+                self._fingerprints[old_key] = value_fingerprint(old_value)
+
+            path = self._path(old_key)
+            with open(path, 'wb') as fp:
+                dump_value(old_value, fp)
+            self._spilled[old_key] = path
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+
+            path = self._spilled.pop(key)
+
+            with open(path, 'rb') as fp:
+                value = load_value(fp)
+            os.remove(path)
+
+            self._put(key, value)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self:
+                self._drop(key)
+
+            self._fingerprints.pop(key, None)
+            self._put(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._drop(key)
+            self._fingerprints.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._data or key in self._spilled
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data) + list(self._spilled))
+
+    def __len__(self):
+        return len(self._data) + len(self._spilled)
+
+    @property
+    def spilled(self) -> int:
+        """
+        Number of values stored on disk
+        """
+        return len(self._spilled)
@@ -0,0 +1,106 @@
+import array
+import unittest
+from unittest import mock
+
+from . import hashing
+from .artifact import InMemoryArtifact
+from .store import SpillingStore, ArtifactStore
+
+
+class SpillingStoreTest(unittest.TestCase):
+    def test_spill(self):
+        store = SpillingStore(memory_limit=10)
+
+        store["a"] = "a" * 6
+        store["b"] = "b" * 6
+        self.assertEqual(1, store.spilled)
+        self.assertIn("a", store)
+        self.assertEqual({"a", "b"}, set(store))
+
+        # loaded back, "b" is spilled instead
+        self.assertEqual("a" * 6, store["a"])
+        self.assertEqual(1, store.spilled)
+        self.assertEqual("b" * 6, store["b"])
+
+        store["c"] = {"x": [1, 2]}
+        self.assertEqual({"x": [1, 2]}, store["c"])
+
+        del store["a"]
+        self.assertNotIn("a", store)
+        with self.assertRaises(KeyError):
+            store["a"]
+        self.assertEqual(2, len(store))
+
+    def test_overwrite(self):
+        store = SpillingStore(memory_limit=10)
+
+        store["a"] = "1" * 6
+        store["b"] = "2" * 6
+        store["a"] = "3"
+        self.assertEqual("3", store["a"])
+        self.assertEqual(hashing.hash_bytes(b"3"), store.fingerprint("a"))
+        self.assertEqual(2, len(store))
+
+    def test_fingerprint_of_spilled(self):
+        store = SpillingStore(memory_limit=10)
+
+        store["a"] = "a" * 6
+        store["b"] = "b" * 6
+
+        with mock.patch("pickle.load") as load:
+            self.assertEqual(hashing.hash_bytes(b"a" * 6), store.fingerprint("a"))
+            load.assert_not_called()
+
+    def test_in_memory_artifact(self):
+        prev = InMemoryArtifact.label2data
+        InMemoryArtifact.label2data = SpillingStore(memory_limit=10)
+
+        try:
+            arts = [InMemoryArtifact(f"spill {i}") for i in range(5)]
+            for a in arts:
+                a.put_data(a.label() * 2)
+
+            self.assertEqual(4, InMemoryArtifact.label2data.spilled)
+            self.assertTrue(arts[0].exists())
+            self.assertEqual(hashing.hash_bytes(b"spill 0spill 0"), arts[0].fingerprint())
+        finally:
+            InMemoryArtifact.label2data = prev
+
+
+class BufferTest(unittest.TestCase):
+    def test_fingerprints(self):
+        store = ArtifactStore()
+        data = bytes(range(200))
+
+        store["bytes"] = data
+        store["bytearray"] = bytearray(data)
+        store["memoryview"] = memoryview(data)
+        store["strided"] = memoryview(data * 2)[::2]
+        store["array"] = array.array("d", [1.0, 2.0])
+
+        for key in ("bytes", "bytearray", "memoryview"):
+            self.assertEqual(hashing.hash_bytes(data), store.fingerprint(key))
+
+        self.assertEqual(hashing.hash_bytes((data * 2)[::2]), store.fingerprint("strided"))
+        self.assertEqual(hashing.hash_bytes(array.array("d", [1.0, 2.0]).tobytes()), store.fingerprint("array"))
+
+    def test_spill(self):
+        store = SpillingStore(memory_limit=10)
+
+        store["view"] = memoryview(b"0123456789")
+        store["array"] = array.array("b", range(10))
+        store["str"] = "x"
+
+        self.assertEqual(2, store.spilled)
+        self.assertEqual(b"0123456789", store["view"])
+        self.assertEqual(array.array("b", range(10)), store["array"])
+
+    def test_put_data(self):
+        a = InMemoryArtifact("buffer")
+
+        with mock.patch("doit.store.value_fingerprint", return_value="fp") as value_fingerprint:
+            a.put_data(memoryview(b"abc"))
+            self.assertEqual("fp", a.fingerprint())
+            self.assertEqual("fp", a.fingerprint())
+
+        value_fingerprint.assert_called_once()
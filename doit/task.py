@@ -2,11 +2,13 @@
 import dataclasses
 import datetime
 from itertools import chain
-from typing import List, Sequence
+from typing import List, Sequence, Tuple, Union
 
-from .action import AbstractAction
+from . import hashing
+from . import stats as _stats
+from .action import AbstractAction, BatchAction, MapAction
 
-from .artifact import ArtifactLabel
+from .artifact import ArtifactLabel, FingerprintMemo
 from .backend import Backend
 from .reporter import ExecutionReporter, TaskEvent
 
@@ -17,6 +19,43 @@ class InconsistentBackend(Exception):
     pass
 
 
+# key of the action fingerprint in run-with records
+ACTION_KEY = "<action>"
+
+
+def execute_action(action: AbstractAction) -> dict:
+    """
+    Execute action, returns its execution stats (see stats.measure)
+    """
+    _, stats = _stats.measure(action.execute)
+    return stats
+
+
+def execute_batch(actions: List[BatchAction]) -> List[dict]:
+    """
+    Execute actions in one call, returns execution stats of each action: totals are split evenly
+    """
+    _, stats = _stats.measure(lambda: BatchAction.execute_batch(actions))
+
+    n = len(actions)
+    for key in ("duration", "cpu_time", "read_bytes", "write_bytes"):
+        stats[key] /= n
+
+    return [stats.copy() for _ in actions]
+
+
+def _next_run_counter(getter, key: str) -> str:
+    """
+    "N @ datetime" fingerprint, N is incremented on every run
+    """
+    try:
+        ix = int(getter(key).split(" ")[0]) + 1
+    except (KeyError, ValueError):  # ValueError: previous fingerprint was content based
+        ix = 0
+
+    return f"{ix} @ {datetime.datetime.utcnow()}"
+
+
 class AutoUpdate(ArtifactLabel):
     def __init__(self, label: str, backend: Backend):
         self._label = label
@@ -27,14 +66,15 @@ class AutoUpdate(ArtifactLabel):
     def fingerprint(self) -> str:
         return self.backend.get_key(self._long_label)
 
-    def update_fingerprint(self):
-        try:
-            prev_run = self.backend.get_key(self._long_label)
-            ix = int(prev_run.split(" ")[0]) + 1
-        except KeyError:
-            ix = 0
+    def update_fingerprint(self, fingerprint: str = None):
+        """
+        :param fingerprint: content fingerprint of the task's targets (see Task.early_cutoff),
+            run counter is used if not given
+        """
+        if fingerprint is None:
+            fingerprint = _next_run_counter(self.backend.get_key, self._long_label)
 
-        self.backend.set_key(self._long_label, f"{ix} @ {datetime.datetime.utcnow()}")
+        self.backend.set_key(self._long_label, fingerprint)
 
     def exists(self) -> bool:
         """
@@ -60,6 +100,10 @@ class Task(Node):
     execute_ones: bool
     ignore: bool
     execution_reporter: ExecutionReporter
+    resource: str = None  # concurrency limit group used by DAG.async_run
+    # fingerprint of the task (and its AutoUpdate targets) is the hash of its targets' content,
+    # so dependent tasks are not executed if the task reproduced the same targets
+    early_cutoff: bool = False
 
     def __repr__(self):
         return f"<Task: {self.name}>"
@@ -73,52 +117,135 @@ class Task(Node):
     def targets(self):
         return chain(self.implicit_targets, self.action.get_all_targets())
 
-    def execute(self, backend: Backend):
+    def execute(self, backend: Backend, memo: FingerprintMemo = None):
         # 1. check if it is needed to execute
         # 2. execute
 
-        if not self.need_execute(backend):
+        if memo is None:
+            memo = FingerprintMemo()
+
+        if not self.need_execute(backend, memo):
             return
 
-        self.action.execute()
-        self.update_fingerprints_in_backend(backend)
+        if isinstance(self.action, MapAction):
+            self.action.load_index(backend)
+
+        stats = execute_action(self.action)
+        self.update_fingerprints_in_backend(backend, memo, stats)
+
+    def update_fingerprints_in_backend(self, backend: Backend, memo: FingerprintMemo = None, stats: dict = None):
+        """
+        Should be called right after the action is executed: targets are dropped from the memo
+
+        :param stats: execution stats of the action (see execute_action)
+        """
+        if memo is None:
+            memo = FingerprintMemo()
+        else:
+            memo.invalidate(self.targets())
 
-    def update_fingerprints_in_backend(self, backend: Backend):
         run_with = {
-                       a.label(): a.fingerprint()
+                       a.label(): memo.fingerprint(a)
                        for a in self.dependencies()
                    } | {
                        other.name: backend.get_task_fingerprint(other.name)
                        for other in self.implicit_task_dependencies
+                   } | {
+                       ACTION_KEY: self.action_fingerprint()
                    }
 
-        backend.set_task_run_with(self.name, run_with)
+        if isinstance(self.action, MapAction):
+            run_with[self.action.inputs.label()] = self.action.inputs_fingerprint()
+
+        content = self.content_fingerprint(memo) if self.early_cutoff else None
+
+        if stats is not None:
+            try:
+                prev_stats = backend.get_task_stats(self.name)
+            except KeyError:
+                prev_stats = None
 
-        try:
-            prev_run = backend.get_task_fingerprint(self.name)
-            ix = int(prev_run.split(" ")[0]) + 1
-        except KeyError:
-            ix = 0
+            stats = {self.name: _stats.with_history(stats, prev_stats)}
 
-        backend.set_task_fingerprint(self.name, f"{ix} @ {datetime.datetime.utcnow()}")
+        backend.set_many(
+            run_with={self.name: run_with},
+            fingerprints={self.name: content or _next_run_counter(backend.get_task_fingerprint, self.name)},
+            stats=stats
+        )
 
         for tar in self.implicit_targets:
             if isinstance(tar, AutoUpdate):
-                tar.update_fingerprint()
+                tar.update_fingerprint(content)
+
+        if isinstance(self.action, MapAction):
+            self.action.save_index(backend)
+
+    def action_fingerprint(self) -> str:
+        """
+        Hash of the action identity (see AbstractAction.identity)
+        """
+        return hashing.hash_bytes(self.action.identity().encode("utf-8"))
+
+    def content_fingerprint(self, memo: FingerprintMemo) -> Union[str, None]:
+        """
+        Hash of labels and fingerprints of the targets (except AutoUpdate ones),
+        None if the task has no such targets or some of them do not exist
+        """
+        targets = sorted((_ for _ in self.targets() if not isinstance(_, AutoUpdate)), key=lambda _: _.label())
+
+        if not targets or not all(_.exists() for _ in targets):
+            return None
+
+        return hashing.hash_bytes("\n".join(f"{_.label()}\t{memo.fingerprint(_)}" for _ in targets).encode("utf-8"))
+
+    def report(self, event: TaskEvent, reason: str, *args):
+        """
+        :param reason: str.format template of the reason, it is formatted with args only if the event is accepted
+        """
+        if self.execution_reporter.accepts(event):
+            self.execution_reporter.task(event, str(self), reason.format(*args) if args else reason)
+
+    def need_execute(self, backend: Backend, memo: FingerprintMemo = None, run_with: dict = None) -> bool:
+        """
+        :param run_with: record of the task prefetched with Backend.get_many_run_with ({} if there is none)
+        """
+        event, reason, args = self.check(backend, memo, run_with)
+        self.report(event, reason, *args)
+
+        return event == TaskEvent.EXECUTE
+
+    def depends_on_inputs(self) -> bool:
+        """
+        False if the task is executed on every run regardless of its dependencies
+        """
+        return not self.always_execute and bool(list(self.dependencies()))
+
+    def check(self, backend: Backend, memo: FingerprintMemo = None,
+              run_with: dict = None) -> Tuple[TaskEvent, str, tuple]:
+        """
+        Same as need_execute, but the result is not reported:
+        (TaskEvent.EXECUTE or TaskEvent.SKIP, reason template, its arguments), see `report`
+        """
+        if memo is None:
+            memo = FingerprintMemo()
 
-    def need_execute(self, backend: Backend):
         if self.ignore:
-            self.execution_reporter.task(TaskEvent.SKIP, str(self), "it is ignored")
-            return False
+            return TaskEvent.SKIP, "it is ignored", ()
 
         if self.always_execute:
-            self.execution_reporter.task(TaskEvent.EXECUTE, str(self), "it is always executed")
-            return True
+            return TaskEvent.EXECUTE, "it is always executed", ()
 
         if not list(self.dependencies()):
             # no dependencies => always execute
-            self.execution_reporter.task(TaskEvent.EXECUTE, str(self), "it has no dependencies")
-            return True
+            return TaskEvent.EXECUTE, "it has no dependencies", ()
+
+        if run_with is None:
+            run_with = backend.get_many_run_with([self.name]).get(self.name, {})
+
+        # records saved by previous versions have no action fingerprint
+        action_fp = run_with.get(ACTION_KEY)
+        if action_fp is not None and action_fp != self.action_fingerprint():
+            return TaskEvent.EXECUTE, "its action has changed", ()
 
         for other in self.implicit_task_dependencies:  # type: Task
             try:
@@ -127,28 +254,22 @@ class Task(Node):
                 raise InconsistentBackend(f"{other} fingerprint is missing from backend")
 
             try:
-                task_rw_fp = backend.get_task_run_with(self.name, other.name)
+                task_rw_fp = run_with[other.name]
             except KeyError:
-                self.execution_reporter.task(TaskEvent.EXECUTE, str(self), f"depends now on {other}")
-                return True
+                return TaskEvent.EXECUTE, "depends now on {}", (other,)
 
             if task_fp != task_rw_fp:
-                self.execution_reporter.task(TaskEvent.EXECUTE, str(self), f"{other} has been updated")
-                return True
+                return TaskEvent.EXECUTE, "{} has been updated", (other,)
 
         for dep in self.dependencies():
             try:
-                if backend.get_task_run_with(self.name, dep.label()) != dep.fingerprint():
-                    self.execution_reporter.task(TaskEvent.EXECUTE, str(self), f"{dep} was updated")
-                    return True
+                if run_with[dep.label()] != memo.fingerprint(dep):
+                    return TaskEvent.EXECUTE, "{} was updated", (dep,)
             except KeyError:
-                self.execution_reporter.task(TaskEvent.EXECUTE, str(self), f"{dep} fingerprint is missing from backend")
-                return True
+                return TaskEvent.EXECUTE, "{} fingerprint is missing from backend", (dep,)
 
         for tar in self.targets():
             if not tar.exists():
-                self.execution_reporter.task(TaskEvent.EXECUTE, str(self), f"{tar} does not exist")
-                return True
+                return TaskEvent.EXECUTE, "{} does not exist", (tar,)
 
-        self.execution_reporter.task(TaskEvent.SKIP, str(self), f"it is up-to-date")
-        return False
+        return TaskEvent.SKIP, "it is up-to-date", ()
@@ -17,6 +17,16 @@ class AutoUpdateTest(unittest.TestCase):
         au.update_fingerprint()
         self.assert_(au.fingerprint()[0] == "1")
 
+    def test_content_fp(self):
+        au = AutoUpdate("au", DictBackend("main", None))
+
+        au.update_fingerprint("abc")
+        self.assertEqual("abc", au.fingerprint())
+
+        # back to run counter
+        au.update_fingerprint()
+        self.assertEqual("0 @", au.fingerprint()[:3])
+
 
 if __name__ == '__main__':
     unittest.main()
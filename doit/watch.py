@@ -0,0 +1,158 @@
+"""Watching source files for changes: inotify on Linux, polling of stat() otherwise"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Iterable, Set
+
+
+class PollingWatcher:
+    """
+    Compares (mtime, size, inode) of files every `interval` seconds
+    """
+
+    def __init__(self, paths: Iterable[str], interval=1.0):
+        self.interval = interval
+        self.path2stat = {str(p): self._stat(p) for p in paths}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _changed(self) -> Set[str]:
+        res = set()
+
+        for path, prev in self.path2stat.items():
+            st = self._stat(path)
+            if st != prev:
+                self.path2stat[path] = st
+                res.add(path)
+
+        return res
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """
+        Paths of changed files, empty set if nothing has changed within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            changed = self._changed()
+            if changed:
+                return changed
+
+            if deadline is None:
+                time.sleep(self.interval)
+            else:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return changed
+                time.sleep(min(self.interval, left))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Watches parent directories of files, so files replaced by rename (as editors and many tools do) are noticed too.
+    Events coming within `debounce` seconds from each other are returned together.
+    """
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    EVENT = struct.Struct("iIII")  # wd, mask, cookie, len of name
+
+    def __init__(self, paths: Iterable[str], debounce=0.05):
+        self.paths = set(str(_) for _ in paths)
+        self.debounce = debounce
+        self.wd2dir = {}
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        try:
+            for d in set(os.path.dirname(_) for _ in self.paths):
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(d), self.MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {d}")
+                self.wd2dir[wd] = d
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def _read(self) -> Set[str]:
+        res = set()
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return res
+
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, size = self.EVENT.unpack_from(data, pos)
+                pos += self.EVENT.size
+
+                name = os.fsdecode(data[pos:pos + size].rstrip(b"\0"))
+                pos += size
+
+                path = os.path.join(self.wd2dir.get(wd, ""), name)
+                if path in self.paths:
+                    res.add(path)
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """
+        Paths of changed files, empty set if nothing has changed within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select([self.fd], [], [], left)[0]:
+                return set()
+
+            changed = self._read()
+
+            while select.select([self.fd], [], [], self.debounce)[0]:
+                changed |= self._read()
+
+            # events of other files in the same directories are dropped
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(paths: Iterable[str], poll_interval=1.0):
+    """
+    InotifyWatcher if it is available, PollingWatcher otherwise
+    """
+    paths = list(paths)
+
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):  # AttributeError: libc has no inotify functions
+            pass
+
+    return PollingWatcher(paths, poll_interval)
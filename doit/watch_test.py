@@ -0,0 +1,174 @@
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from .dag import DAG
+from .backend import DictBackend
+from .artifact import File, FileGlob, InMemoryArtifact
+from .action import delayed
+from .reporter import ExecutionReporter
+from .watch import PollingWatcher, InotifyWatcher
+
+
+class Rep(ExecutionReporter):
+    def task(self, event, task_name: str, reason: str):
+        pass
+
+    def dag(self, event, dag_name: str):
+        pass
+
+
+class WatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.a = Path(self.tmp.name) / "a.txt"
+        self.b = Path(self.tmp.name) / "b.txt"
+        self.a.write_text("a")
+        self.b.write_text("b")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, watcher):
+        try:
+            self.assertEqual(set(), watcher.wait(timeout=0.05))
+
+            self.a.write_text("aa")
+            self.assertEqual({str(self.a)}, watcher.wait(timeout=5))
+
+            # replaced by rename
+            tmp = self.b.with_suffix(".tmp")
+            tmp.write_text("bb")
+            tmp.replace(self.b)
+            self.assertEqual({str(self.b)}, watcher.wait(timeout=5))
+        finally:
+            watcher.close()
+
+    def test_polling(self):
+        self.check(PollingWatcher([str(self.a), str(self.b)], interval=0.01))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify(self):
+        self.check(InotifyWatcher([str(self.a), str(self.b)]))
+
+
+class WatchTest(unittest.TestCase):
+    def test_watch(self):
+        executed = []
+        runs = threading.Semaphore(0)
+
+        def parse(src: File, target: InMemoryArtifact):
+            executed.append(src.path.name)
+            target.put_data(src.path.read_text())
+            runs.release()
+
+        with tempfile.TemporaryDirectory() as d:
+            dag = DAG("main", reporter=Rep())
+
+            files = [Path(d) / f"{i}.txt" for i in range(3)]
+            for f in files:
+                f.write_text(f.name)
+                dag.py_task(f"Parse {f.name}", delayed(parse)(File(f).dep, InMemoryArtifact(f"watch {f.name}").tar))
+
+            stop = threading.Event()
+            thread = threading.Thread(target=dag.watch, args=(DictBackend(dag.dag_name, None), ),
+                                      kwargs=dict(stop=stop, poll_interval=0.01))
+            thread.start()
+
+            try:
+                for _ in files:
+                    self.assertTrue(runs.acquire(timeout=5))
+
+                time.sleep(0.05)
+                files[1].write_text("changed")
+                self.assertTrue(runs.acquire(timeout=5))
+            finally:
+                stop.set()
+                thread.join(5)
+
+        self.assertEqual(["0.txt", "1.txt", "2.txt", "1.txt"], sorted(executed[:3]) + executed[3:])
+        self.assertEqual("changed", InMemoryArtifact.label2data["watch 1.txt"])
+
+    def test_failed_tasks_are_retried(self):
+        executed = []
+        runs = threading.Semaphore(0)
+        fail = [True]
+
+        def build(src: File, target: InMemoryArtifact):
+            executed.append(src.path.name)
+            runs.release()
+            if fail[0] and src.path.name == "a.txt":
+                raise Exception("failure")
+            target.put_data(src.path.read_text())
+
+        def use(source: InMemoryArtifact):
+            executed.append("use")
+            runs.release()
+
+        with tempfile.TemporaryDirectory() as d:
+            a, b = Path(d) / "a.txt", Path(d) / "b.txt"
+            a.write_text("a")
+            b.write_text("b")
+
+            dag = DAG("main", reporter=Rep())
+            dag.py_task("A", delayed(build)(File(a).dep, InMemoryArtifact("retry a").tar))
+            dag.py_task("Use A", delayed(use)(InMemoryArtifact("retry a").dep))
+            dag.py_task("B", delayed(build)(File(b).dep, InMemoryArtifact("retry b").tar))
+
+            stop = threading.Event()
+            thread = threading.Thread(target=dag.watch, args=(DictBackend(dag.dag_name, None), ),
+                                      kwargs=dict(stop=stop, poll_interval=0.01))
+            thread.start()
+
+            try:
+                # A fails, B may be executed or not
+                self.assertTrue(runs.acquire(timeout=5))
+                time.sleep(0.1)
+
+                while runs.acquire(blocking=False):
+                    pass
+
+                fail[0] = False
+                executed.clear()
+                b.write_text("changed")
+                for _ in range(3):
+                    self.assertTrue(runs.acquire(timeout=5))
+            finally:
+                stop.set()
+                thread.join(5)
+
+        self.assertEqual(["a.txt", "b.txt", "use"], sorted(executed))
+
+    def test_glob(self):
+        processed = []
+        runs = threading.Semaphore(0)
+
+        def parse(path: Path):
+            processed.append(path.name)
+            runs.release()
+
+        with tempfile.TemporaryDirectory() as d:
+            (Path(d) / "a.md").write_text("a")
+
+            dag = DAG("main", reporter=Rep())
+            dag.map_task("Parse", parse, FileGlob(d, "*.md"))
+
+            stop = threading.Event()
+            thread = threading.Thread(target=dag.watch, args=(DictBackend(dag.dag_name, None), ),
+                                      kwargs=dict(stop=stop, poll_interval=0.01))
+            thread.start()
+
+            try:
+                self.assertTrue(runs.acquire(timeout=5))
+
+                # new file of the directory
+                (Path(d) / "b.md").write_text("b")
+                self.assertTrue(runs.acquire(timeout=5))
+            finally:
+                stop.set()
+                thread.join(5)
+
+        self.assertEqual(["a.md", "b.md"], processed)
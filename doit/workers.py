@@ -0,0 +1,224 @@
+"""Persistent pool of worker processes used by DAG.run(executor="process")"""
+import copy
+import hashlib
+import os
+import pathlib
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple, Union
+
+import cloudpickle
+
+from .action import AbstractAction, PythonAction
+from .artifact import InMemoryArtifact
+from .task import execute_action, execute_batch
+
+# str and bytes values of InMemoryArtifact's up to this size are sent with tasks and results,
+# larger and other values are passed through files in the pool directory
+INLINE_LIMIT = 64 * 2 ** 10
+
+# in worker processes: content hash -> callable, the oldest ones are dropped above MAX_CALLABLES
+_callables = {}  # type: Dict[str, object]
+MAX_CALLABLES = 256
+# in worker processes: label -> file the value of InMemoryArtifact dependency was loaded from
+_loaded = {}  # type: Dict[str, str]
+
+# (label, value, None) for small values, (label, None, file name) for others
+Values = List[Tuple[str, Any, Union[str, None]]]
+
+
+def _memory_artifacts(artifacts) -> List[InMemoryArtifact]:
+    return [_ for _ in artifacts if isinstance(_, InMemoryArtifact)]
+
+
+def _inline(tar: InMemoryArtifact) -> bool:
+    value = InMemoryArtifact.label2data[tar.label()]
+    return isinstance(value, (str, bytes)) and len(value) <= INLINE_LIMIT
+
+
+def _dump_targets(actions: List[AbstractAction], directory: str) -> Values:
+    res = []
+
+    for tar in _memory_artifacts(_ for action in actions for _ in action.get_all_targets()):
+        if not tar.exists():
+            continue
+
+        if _inline(tar):
+            res.append((tar.label(), InMemoryArtifact.label2data[tar.label()], None))
+            continue
+
+        fd, path = tempfile.mkstemp(suffix=".value", dir=directory)
+        os.close(fd)
+        tar.store(pathlib.Path(path))
+
+        res.append((tar.label(), None, path))
+
+    return res
+
+
+def _load_targets(values: Values) -> None:
+    for label, value, path in values:
+        if path is None:
+            InMemoryArtifact(label).put_data(value)
+        else:
+            InMemoryArtifact(label).restore(pathlib.Path(path))
+            os.remove(path)
+
+
+def _load_dependencies(actions: List[AbstractAction], values: Values) -> None:
+    """
+    Values of dependencies missing from the main process are removed: stale values of previous tasks are not read
+    """
+    label2value = {_[0]: _ for _ in values}
+
+    for dep in _memory_artifacts(_ for action in actions for _ in action.get_all_dependencies()):
+        try:
+            _, value, path = label2value[dep.label()]
+        except KeyError:
+            _loaded.pop(dep.label(), None)
+            InMemoryArtifact.label2data.pop(dep.label(), None)
+            continue
+
+        if path is None:
+            _loaded.pop(dep.label(), None)
+            dep.put_data(value)
+        elif _loaded.get(dep.label()) != path or not dep.exists():
+            # files of dependencies are named by fingerprints of the values
+            dep.restore(pathlib.Path(path))
+            _loaded[dep.label()] = path
+
+
+def _execute(directory: str, digest: Union[str, None], actions_pickle: bytes, batch: bool, dependencies: Values):
+    """
+    Entry point of workers: actions without callables are completed with the callable
+    loaded from `directory` once per worker.
+    Returns execution stats and values of InMemoryArtifact targets.
+    """
+    actions = cloudpickle.loads(actions_pickle)
+
+    _load_dependencies(actions, dependencies)
+
+    # values left by previous tasks executed in this worker
+    for tar in _memory_artifacts(_ for action in actions for _ in action.get_all_targets()):
+        _loaded.pop(tar.label(), None)
+        InMemoryArtifact.label2data.pop(tar.label(), None)
+
+    if digest is not None:
+        func = _callables.get(digest)
+
+        if func is None:
+            with open(os.path.join(directory, digest), 'rb') as fp:
+                func = _callables[digest] = cloudpickle.load(fp)
+
+            if len(_callables) > MAX_CALLABLES:
+                del _callables[next(iter(_callables))]
+
+        for action in actions:
+            action.py_callable = func
+
+    stats = execute_batch(actions) if batch else execute_action(actions[0])
+    return stats, _dump_targets(actions, directory)
+
+
+class WorkerPool:
+    """
+    Worker processes stay alive between runs.
+    Callable of python actions (with closures and captured objects) is pickled once per run into a file
+    named by its content hash, every worker loads it once per content. Tasks send only the hash and their arguments.
+    Values of InMemoryArtifact dependencies are sent to workers, values of InMemoryArtifact targets
+    are put into the main process store before results are returned.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._pool = ProcessPoolExecutor(max_workers=processes)
+
+        self._tmp = tempfile.TemporaryDirectory(prefix="doit-workers-")
+        self._func2digest = {}  # type: Dict[int, Tuple[object, str]]  # id -> (callable, digest), cleared per run
+
+    def new_run(self):
+        """
+        Objects captured by callables may have changed since the previous run: callables are pickled again
+        """
+        self._func2digest.clear()
+
+    def _split(self, actions: List[AbstractAction]) -> Tuple[Union[str, None], bytes]:
+        """
+        Content hash of the callable shared by actions, pickle of actions without it
+        """
+        if not all(isinstance(_, PythonAction) for _ in actions):
+            return None, cloudpickle.dumps(actions)
+
+        func = actions[0].py_callable
+
+        try:
+            _, digest = self._func2digest[id(func)]
+        except KeyError:
+            func_pickle = cloudpickle.dumps(func)
+            digest = hashlib.sha256(func_pickle).hexdigest()
+
+            path = os.path.join(self._tmp.name, digest)
+            if not os.path.exists(path):
+                with open(path + ".tmp", 'wb') as fp:
+                    fp.write(func_pickle)
+                os.replace(path + ".tmp", path)
+
+            # callable is kept referenced: its id is not reused
+            self._func2digest[id(func)] = func, digest
+
+        stripped = []
+        for action in actions:
+            action = copy.copy(action)
+            action.py_callable = None
+            stripped.append(action)
+
+        return digest, cloudpickle.dumps(stripped)
+
+    def _dump_dependencies(self, actions: List[AbstractAction]) -> Values:
+        """
+        Large values are written once per content: files are named by their fingerprints
+        """
+        res = []
+
+        for dep in _memory_artifacts(_ for action in actions for _ in action.get_all_dependencies()):
+            if not dep.exists():
+                continue
+
+            if _inline(dep):
+                res.append((dep.label(), InMemoryArtifact.label2data[dep.label()], None))
+                continue
+
+            path = os.path.join(self._tmp.name, dep.fingerprint().replace(":", "_") + ".dep")
+            if not os.path.exists(path):
+                dep.store(pathlib.Path(path + ".tmp"))
+                os.replace(path + ".tmp", path)
+
+            res.append((dep.label(), None, path))
+
+        return res
+
+    def submit(self, actions: List[AbstractAction], batch=False) -> Future:
+        """
+        Future of execution stats of the action (a list of stats if batch, see task.execute_batch).
+        Actions of a batch should share the callable.
+        """
+        digest, actions_pickle = self._split(actions)
+        dependencies = self._dump_dependencies(actions)
+        res = Future()
+
+        def done(future: Future):
+            try:
+                stats, values = future.result()
+                _load_targets(values)
+            except BaseException as e:
+                res.set_exception(e)
+                return
+
+            res.set_result(stats)
+
+        self._pool.submit(_execute, self._tmp.name, digest, actions_pickle, batch, dependencies).add_done_callback(done)
+        return res
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._tmp.cleanup()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from .action import delayed, batched
+from .artifact import File, InMemoryArtifact
+from .backend import DictBackend
+from .dag import DAG
+from .workers import WorkerPool
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.d = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_callable_cache(self):
+        big = "x" * 100000
+
+        def write(i, target: File):
+            target.path.write_text(f"{i} {len(big)}")
+
+        files = [File(self.d / f"{i}.txt") for i in range(8)]
+
+        pool = WorkerPool(2)
+        try:
+            futures = [pool.submit([delayed(write)(i, f.tar)]) for i, f in enumerate(files)]
+            stats = [_.result(timeout=30) for _ in futures]
+
+            batch = [batched(lambda b: [t.path.write_text("batch") for t, in b])(f.tar) for f in files[:3]]
+            batch_stats = pool.submit(batch, batch=True).result(timeout=30)
+        finally:
+            pool.close()
+
+        self.assertEqual("7 100000", files[7].path.read_text())
+        self.assertEqual("batch", files[0].path.read_text())
+        self.assertTrue(all("duration" in _ for _ in stats))
+        self.assertEqual(3, len(batch_stats))
+
+        # callable is pickled once
+        self.assertEqual(2, len(pool._func2digest))
+        self.assertLessEqual(len({_["worker"].split("/")[0] for _ in stats}), 2)
+        self.assertNotIn(str(os.getpid()), {_["worker"].split("/")[0] for _ in stats})
+
+    def test_pool_is_kept(self):
+        def foo(target: File):
+            target.path.write_text("foo")
+
+        dag = DAG("main")
+        for i in range(3):
+            dag.py_task(f"Task #{i}", delayed(foo)(File(self.d / f"{i}.txt").tar))
+
+        try:
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+            pool = dag._worker_pool
+
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+            self.assertIs(pool, dag._worker_pool)
+        finally:
+            dag.close()
+
+        self.assertIsNone(dag._worker_pool)
+        self.assertEqual("foo", (self.d / "2.txt").read_text())
+
+    def test_memory_targets(self):
+        def produce(size: int, target: InMemoryArtifact):
+            target.put_data("x" * size)
+
+        dag = DAG("main")
+        for size in (10, 10 ** 6):
+            dag.py_task(f"Produce {size}", delayed(produce)(size, InMemoryArtifact(f"worker {size}").tar))
+
+        try:
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+            directory = dag._worker_pool._tmp.name
+            self.assertEqual([], [_ for _ in os.listdir(directory) if _.endswith(".value")])
+        finally:
+            dag.close()
+
+        self.assertEqual("x" * 10, InMemoryArtifact.label2data["worker 10"])
+        self.assertEqual(10 ** 6, len(InMemoryArtifact.label2data["worker 1000000"]))
+        self.assertTrue(InMemoryArtifact("worker 1000000").exists())
+
+    def test_memory_chain(self):
+        def produce(src: File, size: int, target: InMemoryArtifact):
+            target.put_data(src.path.read_text() * size)
+
+        def consume(source: InMemoryArtifact, target: File):
+            value = InMemoryArtifact.label2data[source.label()]
+            target.path.write_text(f"{value[:2]} {len(value)}")
+
+        src = File(self.d / "src.txt")
+
+        dag = DAG("main")
+        for size in (10, 10 ** 6):
+            mem = InMemoryArtifact(f"chain {size}")
+            dag.py_task(f"Produce {size}", delayed(produce)(src.dep, size, mem.tar))
+            dag.py_task(f"Consume {size}", delayed(consume)(mem.dep, File(self.d / f"{size}.txt").tar))
+
+        back = DictBackend(dag.dag_name, None)
+        try:
+            src.path.write_text("a")
+            dag.run(back, jobs=2, executor="process")
+            self.assertEqual("aa 1000000", (self.d / "1000000.txt").read_text())
+
+            # workers do not read values of the previous run
+            src.path.write_text("b")
+            dag.run(back, jobs=2, executor="process")
+        finally:
+            dag.close()
+
+        self.assertEqual("bb 10", (self.d / "10.txt").read_text())
+        self.assertEqual("bb 1000000", (self.d / "1000000.txt").read_text())
+
+    def test_captured_objects_changed(self):
+        cfg = {"version": "v1"}
+
+        def write(target: File):
+            target.path.write_text(cfg["version"])
+
+        out = File(self.d / "out.txt")
+
+        dag = DAG("main", always_execute=True)
+        dag.py_task("Write", delayed(write)(out.tar))
+        dag.py_task("Other", delayed(write)(File(self.d / "other.txt").tar))
+
+        try:
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+            self.assertEqual("v1", out.path.read_text())
+
+            cfg["version"] = "v2"
+            dag.run(DictBackend(dag.dag_name, None), jobs=2, executor="process")
+            self.assertEqual("v2", out.path.read_text())
+        finally:
+            dag.close()